@@ -0,0 +1,484 @@
+import os
+import sys
+import threading
+import time
+import wave
+
+import caption.cpu as cpu
+import caption.vad as vad
+from caption.ringbuffer import RingBuffer, as_bytes
+from caption.segment import Segment
+from caption.startup import timer
+from caption.metrics import metrics
+from caption.registry import registry, estimate_size_mb
+
+SAMPLE_RATE = vad.SAMPLE_RATE
+CHUNK_MS = 30
+# Chunks a StreamSource keeps before reusing their memory
+RING_CHUNKS = 32
+
+
+class AudioSource:
+    """Base class for audio fed to a recognizer as 16 kHz mono 16-bit PCM."""
+
+    uses_microphone = False
+    sample_rate = SAMPLE_RATE
+    name = 'audio'
+    # Monotonic time of the first sample, once chunks() has started
+    started = None
+
+    def chunks(self):
+        """Yields PCM chunks until the source is exhausted."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MicrophoneSource(AudioSource):
+    """The default input device, captured by the recognizer itself."""
+
+    uses_microphone = True
+    name = 'microphone'
+
+    def chunks(self):
+        return iter(())
+
+
+class FileSource(AudioSource):
+    """Replays an audio file, optionally paced at real time."""
+
+    def __init__(self, path, realtime=True, chunk_ms=CHUNK_MS):
+        self.path = path
+        self.name = path
+        self.realtime = realtime
+        self.chunk_bytes = SAMPLE_RATE * chunk_ms // 1000 * 2
+        self.closed = False
+
+    def read_pcm(self):
+        try:
+            with wave.open(self.path, 'rb') as wav:
+                if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (SAMPLE_RATE, 1, 2):
+                    return wav.readframes(wav.getnframes())
+        except (wave.Error, EOFError):
+            pass
+        # Anything that is not already 16 kHz mono PCM goes through the decoder
+        from faster_whisper.audio import decode_audio
+        return vad.to_pcm16(decode_audio(self.path, sampling_rate=SAMPLE_RATE))
+
+    def chunks(self):
+        # Chunks are views into the decoded file, not copies
+        pcm = memoryview(self.read_pcm())
+        self.started = time.monotonic()
+        for offset in range(0, len(pcm), self.chunk_bytes):
+            if self.closed:
+                break
+            if self.realtime:
+                delay = self.started + offset / 2 / SAMPLE_RATE - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            yield pcm[offset:offset + self.chunk_bytes]
+
+    def close(self):
+        self.closed = True
+
+
+class StreamSource(AudioSource):
+    """Raw 16 kHz mono 16-bit PCM read from a binary stream such as stdin."""
+
+    name = 'stream'
+
+    def __init__(self, stream, chunk_ms=CHUNK_MS):
+        self.stream = stream
+        self.chunk_bytes = SAMPLE_RATE * chunk_ms // 1000 * 2
+        self.closed = False
+
+    def chunks(self):
+        self.started = time.monotonic()
+        if not hasattr(self.stream, 'readinto'):
+            while not self.closed:
+                chunk = self.stream.read(self.chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+            return
+        # Read straight into a ring of chunks and hand out views of it; a view
+        # is reused RING_CHUNKS chunks later, long after the recognizer copied it
+        chunk_samples = self.chunk_bytes // 2
+        ring = RingBuffer(chunk_samples * RING_CHUNKS)
+        while not self.closed:
+            count = ring.write_from(self.stream.readinto, chunk_samples)
+            if not count:
+                break
+            yield as_bytes(ring.window(ring.written - count, ring.written))
+
+    def close(self):
+        self.closed = True
+
+
+class DeviceSource(AudioSource):
+    """An input device by PyAudio index, read here rather than by the recognizer.
+
+    Unlike MicrophoneSource this works for any number of devices at once.
+    """
+
+    def __init__(self, index, chunk_ms=CHUNK_MS):
+        self.index = index
+        self.name = f"mic:{index}" if index is not None else 'microphone'
+        self.frames = SAMPLE_RATE * chunk_ms // 1000
+        self.closed = False
+
+    def chunks(self):
+        import pyaudio
+        audio = pyaudio.PyAudio()
+        stream = audio.open(format=pyaudio.paInt16, channels=1, rate=SAMPLE_RATE, input=True,
+                            input_device_index=self.index, frames_per_buffer=self.frames)
+        self.started = time.monotonic()
+        try:
+            while not self.closed:
+                yield stream.read(self.frames, exception_on_overflow=False)
+        finally:
+            stream.stop_stream()
+            stream.close()
+            audio.terminate()
+
+
+class Recognizer:
+    """Base class for speech recognizers driven by Speech.main_program."""
+
+    def __init__(self, speech, source):
+        self.speech = speech
+        self.source = source
+        self.finished = False
+
+    def text(self, callback):
+        """Blocks until the next utterance is recognized and passes its Segment to callback."""
+        raise NotImplementedError
+
+    def backlog_seconds(self):
+        """Seconds of captured audio waiting to be processed, or None if unknown."""
+        return 0.0
+
+    def begin_handover(self):
+        """Called before a replacement recognizer is built."""
+
+    def cancel_handover(self):
+        """Called when building the replacement failed."""
+
+    def hand_over(self, new):
+        """Moves capture to the replacement recognizer."""
+
+    def stop(self, close_source=True):
+        self.finished = True
+        if close_source:
+            self.source.close()
+
+
+class FeedTarget:
+    """The recognizer a source feeder currently feeds.
+
+    One instance is shared by every recognizer a handover chain passes the
+    source along, so the feeder follows each switch, not just the first.
+    """
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+
+
+def recorder_key(kwargs):
+    """Registry key of the recorder built from AudioToTextRecorder kwargs."""
+    return (kwargs['model'], kwargs['realtime_model_type'], kwargs.get('compute_type', 'default'),
+            kwargs['device'])
+
+
+class RealtimeSTTRecognizer(Recognizer):
+    """RealtimeSTT/faster-whisper recognizer, fed by the microphone or any AudioSource.
+
+    Recorders are kept warm in the model registry, so switching back to a
+    recently used model only re-applies the settings instead of reloading it.
+    """
+
+    # Settings that can be changed on a loaded recorder
+    LIVE_SETTINGS = ('language', 'min_length_of_recording', 'min_gap_between_recordings',
+                     'post_speech_silence_duration', 'realtime_processing_pause')
+
+    def __init__(self, speech, source, listen=True):
+        """
+        Args:
+            speech (Speech): Owner of the settings and the text callback.
+            source (AudioSource): Where the audio comes from.
+            listen (bool): Start capturing right away. A recognizer built for a
+                handover is created idle and started by hand_over().
+        """
+        super().__init__(speech, source)
+        kwargs = speech.recorder_kwargs()
+        self.key = recorder_key(kwargs)
+        size = estimate_size_mb(kwargs['model'], self.key[2])
+        if kwargs['enable_realtime_transcription'] and kwargs['realtime_model_type'] != kwargs['model']:
+            size += estimate_size_mb(kwargs['realtime_model_type'], self.key[2])
+        use_microphone = source.uses_microphone and listen
+
+        def load():
+            from RealtimeSTT import AudioToTextRecorder
+            with cpu.model_threads(speech.cpu_plan):
+                return AudioToTextRecorder(use_microphone=use_microphone, **kwargs)
+
+        self.recorder, reused = registry.acquire(self.key, load, size, close=lambda recorder: recorder.shutdown())
+        self.released = False
+        self.handover_chunks = None
+        self.feed_target = FeedTarget(self)
+        # (start, end) monotonic times of the recording wait_audio() last returned.
+        # RealtimeSTT records one utterance per wait_audio() call, so the latest
+        # stop always belongs to the audio about to be transcribed.
+        self.utterance = None
+        self.recording_start = None
+        self.revision = 0
+        if reused:
+            self.apply_settings(kwargs)
+            self.recorder.clear_audio_queue()
+            self.recorder.set_microphone(use_microphone)
+        self.recorder.on_recorded_chunk = self.on_recorded_chunk
+        self.recorder.on_recording_start = self.on_recording_start
+        self.recorder.on_recording_stop = self.on_recording_stop
+        self.recorder.on_realtime_transcription_update = self.on_partial
+        if not source.uses_microphone and listen:
+            self.feeder = threading.Thread(target=self.feed, daemon=True)
+            self.feeder.start()
+
+    def apply_settings(self, kwargs):
+        for name in self.LIVE_SETTINGS:
+            if name in kwargs:
+                setattr(self.recorder, name, kwargs[name])
+
+    def feed(self):
+        # The target changes whenever a handover moves the source to another recognizer
+        target = self.feed_target
+        for chunk in self.source.chunks():
+            if target.recognizer.finished:
+                return
+            target.recognizer.recorder.feed_audio(chunk)
+        # Trailing silence lets the voice activity detection close the last utterance
+        silence = bytes(SAMPLE_RATE * 2 // 10)
+        for _ in range(10):
+            target.recognizer.recorder.feed_audio(silence)
+            time.sleep(0.1)
+        time.sleep(self.speech.post_speech_silence_duration + 1)
+        owner = target.recognizer
+        owner.finished = True
+        owner.interrupt()
+
+    def on_recorded_chunk(self, chunk):
+        chunks = self.handover_chunks
+        if chunks is not None:
+            chunks.append(chunk)
+
+    def on_recording_start(self):
+        timer.mark('first_vad_trigger')
+        self.recording_start = time.monotonic()
+        self.revision = 0
+
+    def on_partial(self, text):
+        self.revision += 1
+        self.speech.process_partial(Segment(
+            text.strip(), self.recording_start, time.monotonic(), lang=self.recorder.language or None,
+            model=self.key[1], source=self.source.name, revision=self.revision, partial=True))
+
+    def on_recording_stop(self):
+        self.utterance = (self.recording_start, time.monotonic())
+        # Everything heard so far belongs to an utterance this recorder transcribes
+        chunks = self.handover_chunks
+        if chunks is not None:
+            chunks.clear()
+
+    def backlog_seconds(self):
+        # RealtimeSTT queues audio in buffer_size blocks until its worker takes them
+        try:
+            return self.recorder.audio_queue.qsize() * self.recorder.buffer_size / SAMPLE_RATE
+        except (AttributeError, NotImplementedError):
+            return None
+
+    def begin_handover(self):
+        """Starts buffering the audio heard since the last completed utterance."""
+        self.handover_chunks = []
+
+    def cancel_handover(self):
+        self.handover_chunks = None
+
+    def hand_over(self, new):
+        """Moves capture to a new recognizer without losing audio.
+
+        The buffered audio is replayed into the new recorder first, then the
+        microphone (or the source feeder) switches over, and whatever arrived
+        in between is replayed last.
+        """
+        chunks = self.handover_chunks or []
+        count = len(chunks)
+        for chunk in chunks[:count]:
+            new.recorder.feed_audio(chunk)
+        if self.source.uses_microphone:
+            new.recorder.set_microphone(True)
+            self.recorder.set_microphone(False)
+        else:
+            new.feeder = getattr(self, 'feeder', None)
+            new.feed_target = self.feed_target
+            self.feed_target.recognizer = new
+        self.handover_chunks = None
+        for chunk in chunks[count:]:
+            new.recorder.feed_audio(chunk)
+
+    def interrupt(self):
+        # Like recorder.abort(), but does not wait for a text() call to notice
+        self.recorder.interrupt_stop_event.set()
+
+    def text(self, callback):
+        # recorder.text() split in two, so the gate sees the audio before the model does
+        recorder = self.recorder
+        recorder.interrupt_stop_event.clear()
+        recorder.was_interrupted.clear()
+        recorder.wait_audio()
+        # Taken even when the audio is dropped below, so it never pairs with the next one
+        start, end = self.utterance or (None, None)
+        self.utterance = None
+        if recorder.is_shut_down or recorder.interrupt_stop_event.is_set():
+            if recorder.interrupt_stop_event.is_set():
+                recorder.was_interrupted.set()
+            return
+        gate = self.speech.gate
+        if gate is not None and recorder.audio is not None and not gate.check(recorder.audio):
+            metrics.gate_skipped.inc()
+            return
+        transcribe_start = time.monotonic()
+        text = recorder.transcribe()
+        transcribe_seconds = time.monotonic() - transcribe_start
+        metrics.transcribe_seconds.observe(transcribe_seconds)
+        if recorder.audio is not None and len(recorder.audio):
+            metrics.realtime_factor.set(transcribe_seconds / (len(recorder.audio) / SAMPLE_RATE))
+        # RealtimeSTT only returns the text, so words and confidence stay unset
+        if text:
+            callback(Segment(text, start, end, lang=self.recorder.language or None, model=self.key[0],
+                             source=self.source.name))
+
+    def stop(self, close_source=True):
+        """Stops listening and parks the recorder in the registry."""
+        super().stop(close_source)
+        if self.released:
+            return
+        self.released = True
+        self.handover_chunks = None
+        self.recorder.on_realtime_transcription_update = None
+        self.recorder.set_microphone(False)
+        self.interrupt()
+        registry.release(self.recorder)
+
+
+class StubRecognizer(Recognizer):
+    """Deterministic recognizer for machines without audio devices or models.
+
+    Utterances are found with a simple energy detector on the source audio.
+    Each one produces the next line of the script, or "utterance N" when the
+    script runs out. With a microphone source no audio is read and a line is
+    produced every `interval` seconds. While an utterance is in progress its
+    line is revealed word by word as partial hypotheses.
+    """
+
+    PARTIAL_WORD_SECONDS = 0.3
+
+    def __init__(self, speech, source, script=None, interval=2.0):
+        super().__init__(speech, source)
+        self.script = script if script is not None else self.load_script(source)
+        self.interval = interval
+        self.count = 0
+        self.segmenter = vad.Segmenter(
+            min_length=speech.get_min_length_of_recording(),
+            post_silence=speech.post_speech_silence_duration / speech.recording_scale)
+        self.chunks = source.chunks()
+
+    @staticmethod
+    def load_script(source):
+        # FileSource fixtures may come with a transcript next to them
+        path = getattr(source, 'path', None)
+        if path:
+            script_path = os.path.splitext(path)[0] + '.txt'
+            if os.path.exists(script_path):
+                with open(script_path, encoding='utf-8') as file:
+                    return [line.strip() for line in file if line.strip()]
+        return []
+
+    def hand_over(self, new):
+        # Continue the same audio and script instead of starting over
+        new.chunks = self.chunks
+        new.count = self.count
+        new.segmenter.position = self.segmenter.position
+
+    def line(self):
+        return self.script[self.count] if self.count < len(self.script) else f"utterance {self.count + 1}"
+
+    def segment(self, text, start, end, **kwargs):
+        if start is None:
+            start = end = time.monotonic()
+        elif self.source.started is not None:
+            start = self.source.started + start / SAMPLE_RATE
+            end = self.source.started + end / SAMPLE_RATE
+        return Segment(text, start, end, confidence=1.0, lang=self.speech.args.get('lang'), model='stub',
+                       source=self.source.name, **kwargs)
+
+    def next_line(self, start=None, end=None):
+        segment = self.segment(self.line(), start, end)
+        self.count += 1
+        return segment
+
+    def partial(self):
+        """Reveals the upcoming line a word per PARTIAL_WORD_SECONDS of speech so far."""
+        start = self.segmenter.speech_start
+        if start is None:
+            return
+        timer.mark('first_vad_trigger')
+        words = self.line().split()
+        heard = (self.segmenter.position - start) / SAMPLE_RATE
+        count = min(len(words), 1 + int(heard / self.PARTIAL_WORD_SECONDS))
+        self.speech.process_partial(self.segment(' '.join(words[:count]), start, self.segmenter.position,
+                                                 revision=count, partial=True))
+
+    def text(self, callback):
+        if self.source.uses_microphone:
+            time.sleep(self.interval)
+            if not self.finished:
+                callback(self.next_line())
+            return
+        for chunk in self.chunks:
+            if self.finished:
+                return
+            utterances = self.segmenter.feed(chunk)
+            if utterances:
+                callback(self.next_line(*utterances[0]))
+                return
+            self.partial()
+        utterances = self.segmenter.flush()
+        if not self.finished and utterances:
+            callback(self.next_line(*utterances[0]))
+        self.finished = True
+
+
+def create_source(args):
+    """Builds the audio source selected by args['source']."""
+    source = args.get('source')
+    if not source:
+        return MicrophoneSource()
+    if source == '-':
+        return StreamSource(sys.stdin.buffer)
+    if source.startswith('mic:'):
+        return DeviceSource(int(source[4:]))
+    return FileSource(source)
+
+
+def create_recognizer(speech, source=None, listen=True):
+    """Builds the recognizer selected by args['backend'] for a Speech instance.
+
+    With listen=False the recognizer is built idle, to take over from the
+    current one through hand_over().
+    """
+    if source is None:
+        source = create_source(speech.args)
+    if speech.args.get('backend') == 'stub':
+        return StubRecognizer(speech, source)
+    return RealtimeSTTRecognizer(speech, source, listen)
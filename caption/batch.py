@@ -0,0 +1,176 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import caption.vad as vad
+import model
+
+AUDIO_EXTENSIONS = ('.wav', '.flac')
+
+# CPU threads per transcription when -j is not given
+THREADS_PER_WORKER = 4
+
+
+def find_audio_files(paths):
+    """Expands files and directories into a sorted list of audio files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                for name in sorted(names):
+                    if name.lower().endswith(AUDIO_EXTENSIONS):
+                        files.append(os.path.join(root, name))
+        elif path.lower().endswith(AUDIO_EXTENSIONS):
+            files.append(path)
+        else:
+            print(f"Skipping unsupported file: {path}")
+    return files
+
+
+def common_root(files):
+    """Deepest directory containing every file, so transcripts under -o keep their layout."""
+    if not files:
+        return None
+    return os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in files])
+
+
+def transcript_path(path, output=None, root=None):
+    """Returns where the transcript of an audio file is written.
+
+    Under output, the directories between root and the file are kept, so
+    a/talk.wav and b/talk.wav do not overwrite each other's transcript.
+    """
+    name = os.path.splitext(os.path.basename(path))[0] + '.txt'
+    if output:
+        relative = os.path.relpath(os.path.dirname(os.path.abspath(path)), root) if root else ''
+        return os.path.normpath(os.path.join(output, relative, name))
+    return os.path.join(os.path.dirname(path), name)
+
+
+def format_timestamp(seconds):
+    """Formats seconds as hh:mm:ss.mmm."""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def write_transcript(path, segments):
+    """Writes (start, end, text) segments as one timestamped line each."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        for start, end, text in segments:
+            file.write(f"[{format_timestamp(start)} --> {format_timestamp(end)}] {text}\n")
+
+
+def resolve_compute_type(args):
+    """Resolves args['compute_type'] once, before the model is loaded."""
+    compute_type = args.get('compute_type') or 'default'
+    if compute_type == 'auto':
+        import caption.calibration as calibration
+        compute_type = calibration.select_compute_type(args['model_name'], args['lang'],
+                                                       args.get('calibration_clip'))
+    return compute_type
+
+
+def _transcribe_file(whisper, path, lang, output, root=None):
+    started = time.time()
+    segments, info = whisper.transcribe(path, language=lang)
+    result = [(seg.start, seg.end, seg.text.strip()) for seg in segments]
+    out = transcript_path(path, output, root)
+    write_transcript(out, result)
+    return out, info.duration, time.time() - started
+
+
+def _transcribe_chunk(whisper, samples, offset, lang):
+    segments, _ = whisper.transcribe(samples, language=lang)
+    return [(offset + seg.start, offset + seg.end, seg.text.strip()) for seg in segments]
+
+
+def transcribe_long(pool, whisper, path, args, root=None, max_pending=2):
+    """Splits one recording at pauses and transcribes the chunks concurrently on pool.
+
+    The decoded audio is needed to find the pauses; chunks are handed to
+    the workers as copies, at most max_pending at a time, so the recording
+    is released once its last chunk is submitted.
+    """
+    from faster_whisper.audio import decode_audio
+
+    started = time.time()
+    samples = decode_audio(path, sampling_rate=vad.SAMPLE_RATE)
+    duration = len(samples) / vad.SAMPLE_RATE
+    min_length = model.min_length_of_recording(args['model_name'], args['lang'])
+    ranges = vad.split_on_silence(samples, target_length=args.get('chunk_length') or 30.0,
+                                  min_length=min_length)
+    print(f"{path}: {duration:.1f}s audio in {len(ranges)} chunk(s)")
+
+    results = [None] * len(ranges)
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            i = pending.pop(future)
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                print(f"Error transcribing chunk {i} of {path}: {e}")
+                results[i] = []
+
+    for i, (start, end) in enumerate(ranges):
+        if len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+        pending[pool.submit(_transcribe_chunk, whisper, samples[start:end].copy(), start / vad.SAMPLE_RATE, args['lang'])] = i
+    del samples
+    collect(list(as_completed(pending)))
+
+    out = transcript_path(path, args.get('output'), root)
+    write_transcript(out, [segment for chunk in results for segment in chunk])
+    print(f"{path} -> {out} ({duration:.1f}s audio in {time.time() - started:.1f}s)")
+
+
+def run(args):
+    """Transcribes every file in args['files'] with one model shared by a pool of worker threads."""
+    files = find_audio_files(args['files'])
+    if not files:
+        print("No audio files to transcribe")
+        return
+
+    output = args.get('output')
+    if output:
+        os.makedirs(output, exist_ok=True)
+    root = common_root(files)
+
+    cpu_count = os.cpu_count() or 1
+    workers = args.get('workers') or max(1, cpu_count // THREADS_PER_WORKER)
+    if not args.get('split'):
+        # Chunks, not files, are spread over the workers with --split
+        workers = min(workers, len(files))
+    cpu_threads = max(1, cpu_count // workers)
+    print(f"Transcribing {len(files)} file(s) with {workers} worker(s), {cpu_threads} thread(s) each")
+
+    from faster_whisper import WhisperModel
+    # CTranslate2 runs up to num_workers transcriptions in parallel on a single
+    # copy of the weights, so memory does not grow with the number of workers
+    whisper = WhisperModel(args['model_name'], device='cpu', cpu_threads=cpu_threads, num_workers=workers,
+                           compute_type=resolve_compute_type(args))
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        if args.get('split'):
+            for path in files:
+                transcribe_long(pool, whisper, path, args, root, max_pending=2 * workers)
+            print(f"Done in {time.time() - started:.1f}s")
+            return
+        futures = {pool.submit(_transcribe_file, whisper, path, args['lang'], output, root): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                out, duration, elapsed = future.result()
+                print(f"{path} -> {out} ({duration:.1f}s audio in {elapsed:.1f}s)")
+            except Exception as e:
+                print(f"Error transcribing {path}: {e}")
+    print(f"Done in {time.time() - started:.1f}s")
@@ -0,0 +1,382 @@
+"""Caption latency benchmark.
+
+Replays recorded audio fixtures through the Speech pipeline in real time and
+reports, for every utterance, the latency from the end of speech to
+process_text, to newLineSignal.emit and (with --gui) to the rendered line.
+Each (model, fixture) run is written as one JSON line.
+
+    python -m caption.bench fixtures/*.wav --models tiny,base --lang en
+    python -m caption.bench fixtures/talk.wav --backend stub --post-speech-silence 0.3
+    python -m caption.bench fixtures/talk.wav --models small --cpu-sweep
+    python -m caption.bench --startup-budget 0.5
+    python -m caption.bench --dedup Logs/2025/05/01/01-19-30-00_speech-base.log
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+import model
+import caption.backend as backend
+import caption.cpu as cpu
+import caption.vad as vad
+
+# Modules only --gui and --web need; a CLI start must not import them
+HEAVY_MODULES = ('PyQt5', 'sklearn', 'flask', 'pynput')
+# A caption line of a session log: the time it was written, then the text
+LOG_LINE = re.compile(r'^\d\d:\d\d:\d\d (.+)$')
+
+
+class _Signal:
+    def __init__(self, callback):
+        self.callback = callback
+
+    def emit(self, text):
+        self.callback(text)
+
+
+class Sink:
+    """Stands in for the GUI in headless runs and records delivery times."""
+
+    def __init__(self, timings):
+        self.newLineSignal = _Signal(lambda text: timings['emit'].append(time.monotonic()))
+        self.partialLineSignal = _Signal(lambda segment: timings['partial'].append((time.monotonic(), segment)))
+
+    def updateRecordingStatus(self, enabled):
+        pass
+
+
+def speech_ends(path, aggressiveness=2, post_silence=0.3):
+    """Returns the end of every utterance in a fixture, in seconds from its start."""
+    with wave.open(path, 'rb') as wav:
+        pcm = wav.readframes(wav.getnframes())
+        duration = wav.getnframes() / wav.getframerate()
+    segmenter = vad.Segmenter(post_silence=post_silence, aggressiveness=aggressiveness)
+    utterances = segmenter.feed(pcm) + segmenter.flush()
+    return [end / vad.SAMPLE_RATE for _, end in utterances], duration
+
+
+def realtime_factor(model_name, lang, path, duration, compute_type='default'):
+    """Offline decode time of the fixture divided by its duration."""
+    from faster_whisper import WhisperModel
+    whisper = WhisperModel(model_name, device='cpu', compute_type=compute_type)
+    started = time.monotonic()
+    segments, _ = whisper.transcribe(path, language=lang)
+    list(segments)
+    return (time.monotonic() - started) / duration
+
+
+def summarize(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        'p50': values[len(values) // 2],
+        'p90': values[min(len(values) - 1, int(len(values) * 0.9))],
+        'max': values[-1],
+    }
+
+
+def match_ends(ends, started, times):
+    """Pairs every caption time with the latest speech end before it."""
+    matched = []
+    i = -1
+    for t in times:
+        while i + 1 < len(ends) and started + ends[i + 1] <= t:
+            i += 1
+        matched.append(started + ends[i] if i >= 0 else None)
+    return matched
+
+
+def run_once(options, model_name, fixture):
+    import caption.speech as speech
+
+    args = {
+        'model_name': model_name,
+        'realtime_model': options.realtime_model or model_name,
+        'lang': options.lang,
+        'gui': options.gui,
+        'web': False,
+        'realtime': not options.no_realtime,
+        'backend': options.backend,
+        'source': fixture,
+        'use_microphone': False,
+        'compute_type': options.compute_type,
+        'cpu_split': options.cpu_split,
+        'pin_cpus': options.pin_cpus,
+        'partial_rate': options.partial_rate,
+        'gate': not options.no_gate,
+        'path': os.getcwd(),
+    }
+    captioner = speech.Speech(args)
+    captioner.source = backend.FileSource(fixture)
+    if options.recording_scale is not None:
+        captioner.recording_scale = options.recording_scale
+    if options.min_gap is not None:
+        captioner.min_gap_between_recordings = options.min_gap
+    if options.post_speech_silence is not None:
+        captioner.post_speech_silence_duration = options.post_speech_silence
+
+    timings = {'process': [], 'emit': [], 'rendered': [], 'text': [], 'partial': []}
+    process_text = captioner.process_text
+
+    def timed_process_text(segment):
+        timings['process'].append(time.monotonic())
+        timings['text'].append(segment)
+        process_text(segment)
+
+    captioner.process_text = timed_process_text
+
+    ends, duration = speech_ends(fixture, post_silence=captioner.post_speech_silence_duration)
+    thread = threading.Thread(target=captioner.main_program)
+    if options.gui:
+        import caption.gui as gui
+        from PyQt5.QtCore import QTimer
+        ui = gui.initialize()
+        ui.speech = captioner
+        # Connected after addNewLine, so it runs once the line has been laid out
+        ui.newLineSignal.connect(lambda segment: timings['rendered'].append(time.monotonic()))
+        ui.partialLineSignal.connect(lambda segment: timings['partial'].append((time.monotonic(), segment)))
+        deliver_to_ui = captioner.deliver_to_ui
+
+        def timed_deliver_to_ui(event):
+            deliver_to_ui(event)
+            if event.kind == 'line':
+                timings['emit'].append(time.monotonic())
+
+        captioner.deliver_to_ui = timed_deliver_to_ui
+        captioner.attach_ui(ui)
+
+        def quit_when_done():
+            if not thread.is_alive() and not captioner.bus.stats()['gui']['queued']:
+                ui.app.quit()
+
+        timer = QTimer()
+        timer.timeout.connect(quit_when_done)
+        thread.start()
+        timer.start(100)
+        ui.app.exec_()
+    else:
+        captioner.attach_ui(Sink(timings))
+        thread.start()
+    thread.join()
+    # Deliver whatever is still queued for the subscribers
+    captioner.bus.close()
+
+    count = len(timings['text'])
+    started = captioner.source.started
+    speech_end = match_ends(ends, started, timings['process']) if started else [None] * count
+
+    def delta(a, b):
+        a = list(a) + [None] * (count - len(a))
+        b = list(b) + [None] * (count - len(b))
+        return [y - x if x is not None and y is not None else None for x, y in zip(a, b)]
+
+    to_process = delta(speech_end, timings['process'])
+    to_emit = delta(timings['process'], timings['emit'])
+    to_rendered = delta(timings['emit'], timings['rendered'])
+    # The recognizer's own end of recording, after its post-speech silence
+    recorded_to_process = delta([getattr(segment, 'end', None) for segment in timings['text']], timings['process'])
+    # Partials and the final text of one utterance share its start time
+    first_partial = {}
+    for t, segment in timings['partial']:
+        first_partial.setdefault(segment.start, t)
+
+    def from_start(segment, t):
+        start = getattr(segment, 'start', None)
+        return t - start if start is not None and t is not None else None
+
+    utterances = [{
+        'text': str(segment),
+        'speech_end_to_process': to_process[i],
+        'recorded_end_to_process': recorded_to_process[i],
+        'start_to_first_partial': from_start(segment, first_partial.get(getattr(segment, 'start', None))),
+        'start_to_process': from_start(segment, timings['process'][i]),
+        'process_to_emit': to_emit[i],
+        'emit_to_rendered': to_rendered[i],
+    } for i, segment in enumerate(timings['text'])]
+
+    return {
+        'model': model_name,
+        'fixture': fixture,
+        'backend': options.backend,
+        'duration': duration,
+        'compute_type': captioner.compute_type,
+        'rtf': realtime_factor(model_name, options.lang, fixture, duration, captioner.compute_type)
+        if options.backend != 'stub' else None,
+        'params': {
+            'recording_scale': captioner.recording_scale,
+            'min_gap_between_recordings': captioner.min_gap_between_recordings,
+            'post_speech_silence_duration': captioner.post_speech_silence_duration,
+            'min_length_of_recording': captioner.get_min_length_of_recording(),
+            'cpu_plan': captioner.cpu_plan.to_dict(),
+        },
+        'speech_ends': len(ends),
+        'captions': len(utterances),
+        'partials': captioner.partials.stats(),
+        'bus': captioner.bus.stats(),
+        'gate': captioner.gate.stats() if captioner.gate else None,
+        'latency': {
+            'start_to_first_partial': summarize(u['start_to_first_partial'] for u in utterances),
+            'start_to_process': summarize(u['start_to_process'] for u in utterances),
+            'speech_end_to_process': summarize(u['speech_end_to_process'] for u in utterances),
+            'process_to_emit': summarize(u['process_to_emit'] for u in utterances),
+            'emit_to_rendered': summarize(u['emit_to_rendered'] for u in utterances),
+            'speech_end_to_rendered': summarize(
+                u['speech_end_to_process'] + u['process_to_emit'] + u['emit_to_rendered']
+                for u in utterances if None not in u.values()),
+        },
+        'utterances': utterances,
+    }
+
+
+def startup_time(module='caption.speech', runs=3):
+    """Times importing module in fresh interpreters and lists the heavy modules it pulls in.
+
+    This is the fixed cost before model loading starts in a CLI run.
+    """
+    code = ("import sys, time; started = time.perf_counter(); import {module}; "
+            "print(time.perf_counter() - started); print(','.join(m for m in {heavy!r} if m in sys.modules))")
+    timings = []
+    heavy = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code.format(module=module, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True)
+        seconds, loaded = result.stdout.split('\n')[-3:-1]
+        timings.append(float(seconds))
+        heavy = [name for name in loaded.split(',') if name]
+    timings.sort()
+    return {'module': module, 'import_seconds': timings[len(timings) // 2], 'heavy_modules': heavy}
+
+
+def check_startup(budget, output):
+    """Writes the startup measurement and returns whether it is within budget."""
+    result = startup_time()
+    result['budget'] = budget
+    result['ok'] = result['import_seconds'] <= budget and not result['heavy_modules']
+    output.write(json.dumps({'startup': result}) + '\n')
+    output.flush()
+    return result['ok']
+
+
+def check_dedup(path, output):
+    """Writes the cost and agreement of the incremental and scikit-learn duplicate line checks."""
+    import caption.dedup as dedup
+    with open(path, encoding='utf-8') as file:
+        lines = [line.strip() for line in file if line.strip()]
+    matches = [LOG_LINE.match(line) for line in lines]
+    if any(matches):
+        # A session log: the weekday, bare time and Args header lines have no
+        # time prefix, and clear markers are not captions
+        lines = [match.group(1) for match in matches if match and match.group(1) != '-- Clear --']
+    output.write(json.dumps({'dedup': dict(dedup.benchmark(lines), transcript=path)}) + '\n')
+    output.flush()
+
+
+def cpu_splits(count):
+    """Candidate MAIN:REALTIME thread splits for count CPUs."""
+    realtime = sorted({1, max(1, count // 8), max(1, count // 4), max(1, count // 2)})
+    return [f"{count - r}:{r}" for r in realtime if count - r >= 1]
+
+
+def sweep_cpu_splits(argv, output):
+    """Benchmarks every CPU split in a fresh process and reports the fastest.
+
+    Thread counts are fixed once the numerical libraries load, so each split
+    needs its own process. Splits are ranked by the median latency from end
+    of speech to the final caption.
+    """
+    results = []
+    for split in cpu_splits(len(cpu.available_cpus())):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'split.jsonl')
+            subprocess.run([sys.executable, '-m', 'caption.bench', *argv,
+                            '--cpu-split', split, '--pin-cpus', '--output', path])
+            with open(path, encoding='utf-8') as file:
+                runs = [json.loads(line) for line in file]
+        latencies = [run['latency']['speech_end_to_process']['p50'] for run in runs
+                     if run.get('latency') and run['latency']['speech_end_to_process']]
+        results.append({
+            'split': split,
+            'final_caption_latency_p50': sum(latencies) / len(latencies) if latencies else None,
+            'runs': runs,
+        })
+    ranked = [r for r in results if r['final_caption_latency_p50'] is not None]
+    best = min(ranked, key=lambda r: r['final_caption_latency_p50'])['split'] if ranked else None
+    output.write(json.dumps({'cpu_sweep': results, 'best': best}) + '\n')
+    print(f"Best split (main:realtime threads): {best}", file=sys.stderr)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Replay audio fixtures and measure caption latency.")
+    parser.add_argument('fixtures', nargs='*', help="16 kHz mono 16-bit WAV files")
+    parser.add_argument('--models', default='base',
+                        help="comma separated model names or indexes, or 'all' for model.model_names")
+    parser.add_argument('--realtime-model', default=None)
+    parser.add_argument('--lang', default=None)
+    parser.add_argument('--backend', default='realtimestt', choices=['realtimestt', 'stub'])
+    parser.add_argument('--no-realtime', action='store_true', help="disable realtime transcription")
+    parser.add_argument('--gui', action='store_true', help="also measure rendering in the caption window")
+    parser.add_argument('--recording-scale', type=float, default=None)
+    parser.add_argument('--min-gap', type=float, default=None, help="min_gap_between_recordings")
+    parser.add_argument('--post-speech-silence', type=float, default=None, help="post_speech_silence_duration")
+    parser.add_argument('--compute-type', default='default', help="compute type, or 'auto'")
+    parser.add_argument('--cpu-split', default=None, help="MAIN:REALTIME model thread counts")
+    parser.add_argument('--pin-cpus', action='store_true', help="pin each model to its own CPUs")
+    parser.add_argument('--partial-rate', type=float, default=10.0, help="live line updates per second")
+    parser.add_argument('--no-gate', action='store_true', help="disable the silence and noise gate")
+    parser.add_argument('--cpu-sweep', action='store_true',
+                        help="try several CPU splits and report the one with the lowest final-caption latency")
+    parser.add_argument('--startup-budget', type=float, default=None,
+                        help="check that a CLI start imports within this many seconds and without GUI/web modules")
+    parser.add_argument('--dedup', default=None, metavar='TRANSCRIPT',
+                        help="compare the duplicate line check with the scikit-learn one on a transcript or session log")
+    parser.add_argument('--output', default=None, help="append JSON lines here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    options = parse_args(argv)
+    if options.models == 'all':
+        models = list(model.model_names)
+    else:
+        models = [model.resolve_model(name, name) for name in options.models.split(',')]
+
+    output = open(options.output, 'a', encoding='utf-8') if options.output else sys.stdout
+    try:
+        if options.startup_budget is not None:
+            if not check_startup(options.startup_budget, output):
+                sys.exit(1)
+            if not options.fixtures:
+                return
+        if options.dedup:
+            check_dedup(options.dedup, output)
+            if not options.fixtures:
+                return
+        if options.cpu_sweep:
+            sweep_cpu_splits([a for a in argv if a != '--cpu-sweep'], output)
+            return
+        for model_name in models:
+            for fixture in options.fixtures:
+                try:
+                    result = run_once(options, model_name, fixture)
+                except Exception as e:
+                    result = {'model': model_name, 'fixture': fixture, 'error': str(e)}
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
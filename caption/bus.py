@@ -0,0 +1,151 @@
+import queue
+import threading
+import time
+
+# What a subscription does when its queue is full
+DROP = 'drop'                # discard the new event
+DROP_OLDEST = 'drop_oldest'  # discard the oldest queued event to make room
+BLOCK = 'block'              # wait up to `timeout` seconds, then discard the new event
+
+POLICIES = (DROP, DROP_OLDEST, BLOCK)
+
+
+class Event:
+    """A transcript event: a final line, a partial hypothesis or a clear."""
+
+    __slots__ = ('kind', 'segment', 'time')
+
+    def __init__(self, kind, segment=None):
+        self.kind = kind
+        self.segment = segment
+        self.time = time.monotonic()
+
+    def __repr__(self):
+        return f"Event({self.kind!r}, {self.segment!r})"
+
+
+class Subscription:
+    """A subscriber's bounded queue and the thread that drains it into its handler."""
+
+    def __init__(self, name, handler, maxsize=100, policy=DROP_OLDEST, timeout=0.5, kinds=None):
+        """
+        Args:
+            name (str): Name for messages and stats.
+            handler (callable): Called with each Event on the subscription's own thread.
+            maxsize (int): Events queued before the policy applies.
+            policy (str): DROP, DROP_OLDEST or BLOCK.
+            timeout (float): Longest a BLOCK publish waits for room.
+            kinds (iterable, optional): Event kinds to receive; all when omitted.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}, expected one of {POLICIES}")
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.timeout = timeout
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.queue = queue.Queue(maxsize)
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name=f"bus-{name}", daemon=True)
+        self.thread.start()
+
+    def wants(self, event):
+        return not self.closed and (self.kinds is None or event.kind in self.kinds)
+
+    def put(self, event):
+        if self.policy == DROP:
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1
+        elif self.policy == DROP_OLDEST:
+            while True:
+                try:
+                    self.queue.put_nowait(event)
+                    return
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        else:
+            try:
+                self.queue.put(event, timeout=self.timeout)
+            except queue.Full:
+                self.dropped += 1
+
+    def run(self):
+        while True:
+            event = self.queue.get()
+            if event is None:
+                return
+            try:
+                self.handler(event)
+                self.delivered += 1
+            except Exception as e:
+                print(f"Error in {self.name} subscriber: {e}")
+
+    def close(self, timeout=1.0):
+        """Stops the thread once the events already queued are handled."""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        if threading.current_thread() is not self.thread:
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {'queued': self.queue.qsize(), 'delivered': self.delivered, 'dropped': self.dropped,
+                'policy': self.policy}
+
+
+class EventBus:
+    """Publishes each transcript event once to any number of subscribers.
+
+    Every subscriber has its own bounded queue and thread, so a slow GUI,
+    web client or log file only ever delays itself. publish() only waits
+    for BLOCK subscribers whose queue is full, each for at most its timeout.
+    """
+
+    def __init__(self):
+        self.subscriptions = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, name, handler, maxsize=100, policy=DROP_OLDEST, timeout=0.5, kinds=None):
+        """Adds a subscriber; see Subscription for the arguments."""
+        subscription = Subscription(name, handler, maxsize, policy, timeout, kinds)
+        with self.lock:
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+        subscription.close()
+
+    def publish(self, kind, segment=None):
+        event = Event(kind, segment)
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            if subscription.wants(event):
+                subscription.put(event)
+        return event
+
+    def stats(self):
+        with self.lock:
+            return {subscription.name: subscription.stats() for subscription in self.subscriptions}
+
+    def close(self):
+        """Stops every subscriber; their stats stay available."""
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
@@ -0,0 +1,165 @@
+import difflib
+import json
+import os
+import socket
+import time
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'captioner', 'calibration.json')
+
+# Compute types tried by auto selection, on CPU
+AUTO_COMPUTE_TYPES = ('int8', 'int8_float32', 'int16', 'float32')
+# Word agreement with the float32 transcript a compute type must reach
+ACCURACY_FLOOR = 0.9
+
+# Shortest utterance worth sending to the model, whatever the host speed
+MIN_LENGTH_FLOOR = 0.3
+MIN_LENGTH_CEILING = 10.0
+
+
+def calibration_clip(duration=4.0):
+    """Synthesizes a speech-like clip: voiced harmonics modulated at syllable rate."""
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 20 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None)
+    noise = np.random.default_rng(0).standard_normal(len(t)) * 0.02
+    clip = voice * envelope + noise
+    return (0.3 * clip / np.abs(clip).max()).astype(np.float32)
+
+
+def load_clip(path=None):
+    """Returns the given audio file as 16 kHz samples, or the built-in clip."""
+    if not path:
+        return calibration_clip()
+    from faster_whisper.audio import decode_audio
+    return decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+
+def cache_key(model_name, compute_type='default'):
+    return f"{socket.gethostname()}|{model_name}|{compute_type}"
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache, path=CACHE_PATH):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, indent=2, sort_keys=True)
+    except OSError as e:
+        print(f"Could not save calibration: {e}")
+
+
+def measure(model_name, compute_type='default', lang=None, runs=3, clip=None):
+    """Times transcription of the calibration clip on this host.
+
+    Whisper pads every utterance to a 30 s window, so the time per call is
+    close to constant; the median over a few runs after a warm-up call is
+    the per-utterance overhead.
+    """
+    from faster_whisper import WhisperModel
+    whisper = WhisperModel(model_name, device='cpu', compute_type=compute_type)
+    clip = calibration_clip() if clip is None else clip
+    text = ''
+
+    def transcribe():
+        nonlocal text
+        started = time.monotonic()
+        segments, _ = whisper.transcribe(clip, language=lang or 'en', beam_size=5)
+        text = ' '.join(segment.text.strip() for segment in segments)
+        return time.monotonic() - started
+
+    transcribe()
+    timings = sorted(transcribe() for _ in range(runs))
+    overhead = timings[len(timings) // 2]
+    return {
+        'overhead': overhead,
+        'rtf': overhead / (len(clip) / SAMPLE_RATE),
+        'text': text,
+        'measured': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def agreement(reference, text):
+    """Word-level similarity of two transcripts, from 0 to 1."""
+    return difflib.SequenceMatcher(None, reference.lower().split(), text.lower().split()).ratio()
+
+
+def select_compute_type(model_name, lang=None, clip_path=None, force=False, path=CACHE_PATH):
+    """Picks the fastest compute type whose transcript stays close to float32.
+
+    Each candidate transcribes the calibration clip (a real recording given
+    with clip_path gives a meaningful accuracy check; the built-in clip only
+    catches gross failures). The choice is remembered per host and model.
+    """
+    cache = load_cache(path)
+    key = cache_key(model_name, 'auto')
+    if not force and key in cache:
+        return cache[key]['compute_type']
+
+    print(f"Selecting compute type for {model_name} on this host...")
+    clip = load_clip(clip_path)
+    results = {}
+    for compute_type in AUTO_COMPUTE_TYPES:
+        try:
+            results[compute_type] = measure(model_name, compute_type, lang, runs=1, clip=clip)
+        except Exception as e:
+            print(f"Compute type {compute_type} unavailable: {e}")
+    if 'float32' not in results:
+        return 'default'
+
+    reference = results['float32']['text']
+    for result in results.values():
+        result['agreement'] = agreement(reference, result['text'])
+    accurate = [t for t, result in results.items() if result['agreement'] >= ACCURACY_FLOOR]
+    best = min(accurate, key=lambda t: results[t]['overhead'])
+    cache[key] = {'compute_type': best, 'candidates': results}
+    save_cache(cache, path)
+    print(f"Using compute type {best} for {model_name}")
+    return best
+
+
+def derive(result):
+    """Derives recorder timing from a measurement.
+
+    An utterance takes about `overhead` seconds to transcribe, so shorter
+    utterances queue up faster than they are captioned. The minimum
+    recording length is therefore the overhead, and the realtime model (when
+    it is the same model) should not be polled more often than it can run.
+    """
+    overhead = result['overhead']
+    return {
+        'min_length_of_recording': min(MIN_LENGTH_CEILING, max(MIN_LENGTH_FLOOR, overhead)),
+        'realtime_processing_pause': min(1.0, max(0.05, overhead / 2)),
+    }
+
+
+def calibrate(model_name, compute_type='default', lang=None, force=False, path=CACHE_PATH):
+    """Returns timing settings for this host and model, measuring them once.
+
+    Args:
+        model_name (str): Model to calibrate.
+        compute_type (str): Compute type the model runs with.
+        lang (str, optional): Language of the calibration run.
+        force (bool): Measure again even if a cached result exists.
+        path (str): Cache file.
+    """
+    cache = load_cache(path)
+    key = cache_key(model_name, compute_type)
+    if force or key not in cache:
+        print(f"Calibrating {model_name} ({compute_type}) on this host...")
+        cache[key] = measure(model_name, compute_type, lang)
+        save_cache(cache, path)
+    result = dict(cache[key])
+    result.update(derive(result))
+    return result
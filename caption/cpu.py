@@ -0,0 +1,142 @@
+import os
+import threading
+from contextlib import contextmanager
+
+
+def available_cpus():
+    """CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CpuPlan:
+    """Thread counts and optional CPU sets for the final model, the realtime model and the UI."""
+
+    def __init__(self, main_threads, realtime_threads, main_cpus=None, realtime_cpus=None, ui_cpus=None):
+        self.main_threads = main_threads
+        self.realtime_threads = realtime_threads
+        self.main_cpus = main_cpus
+        self.realtime_cpus = realtime_cpus
+        self.ui_cpus = ui_cpus
+
+    def to_dict(self):
+        return {
+            'main_threads': self.main_threads,
+            'realtime_threads': self.realtime_threads,
+            'main_cpus': self.main_cpus,
+            'realtime_cpus': self.realtime_cpus,
+            'ui_cpus': self.ui_cpus,
+        }
+
+    def __repr__(self):
+        return f"CpuPlan({self.to_dict()})"
+
+
+def make_plan(args=None):
+    """Splits the available CPUs between the final and realtime models.
+
+    args['cpu_split'] may give the split as "MAIN:REALTIME" thread counts;
+    by default the realtime model gets a quarter of the CPUs. With
+    args['pin_cpus'] each side is also pinned to its own CPUs, and the GUI
+    and log threads share the realtime CPUs.
+    """
+    args = args or {}
+    cpus = available_cpus()
+    count = len(cpus)
+    split = args.get('cpu_split')
+    if split:
+        main, realtime = (int(part) for part in split.split(':'))
+    elif not args.get('realtime', True) or count == 1:
+        main, realtime = count, 0
+    else:
+        realtime = max(1, count // 4)
+        main = count - realtime
+    main = max(1, main)
+
+    plan = CpuPlan(main, realtime)
+    if args.get('pin_cpus') and realtime and main + realtime <= count:
+        plan.main_cpus = cpus[:main]
+        plan.realtime_cpus = cpus[main:main + realtime]
+        plan.ui_cpus = plan.realtime_cpus
+    return plan
+
+
+def configure_environment(plan):
+    """Sets the thread environment read by OpenMP/MKL when they load.
+
+    Models whose thread count cannot be passed directly, and processes
+    spawned for them, fall back to these values.
+    """
+    threads = str(plan.main_threads)
+    os.environ["OMP_NUM_THREADS"] = threads
+    os.environ["MKL_NUM_THREADS"] = threads
+    os.environ["NUMEXPR_NUM_THREADS"] = threads
+    # Spinning threads only help when the two models do not share cores
+    oversubscribed = plan.main_threads + plan.realtime_threads > len(available_cpus())
+    os.environ["OMP_WAIT_POLICY"] = "PASSIVE" if oversubscribed else "ACTIVE"
+
+
+def pin_current_thread(cpus):
+    """Restricts the calling thread (and threads it starts later) to cpus.
+
+    Returns the CPU set the thread had before, or None if it was not changed.
+    """
+    if not cpus or not hasattr(os, 'sched_setaffinity'):
+        return None
+    try:
+        # On Linux pid 0 is the calling thread, not the whole process
+        previous = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, cpus)
+        return previous
+    except OSError as e:
+        print(f"Could not set CPU affinity: {e}")
+        return None
+
+
+# WhisperModel.__init__ is patched for the whole process, so one build at a time
+patch_lock = threading.Lock()
+
+
+@contextmanager
+def model_threads(plan):
+    """Applies the plan to the faster-whisper models loaded inside the block.
+
+    RealtimeSTT does not take a thread count, so WhisperModel is wrapped
+    while a recorder is built: the realtime model is loaded on the calling
+    thread and the final model on RealtimeSTT's transcription worker, which
+    tells the two apart. Each loading thread is pinned before the model
+    starts its own threads, so those inherit the CPU set; the calling thread
+    gets its own CPU set back once its model is loaded.
+
+    Outside Linux RealtimeSTT runs the transcription worker in a spawned
+    process, which does not see the wrapper: the final model there gets its
+    thread count from the environment set by configure_environment() and
+    is not pinned.
+    """
+    import faster_whisper
+    with patch_lock:
+        original = faster_whisper.WhisperModel.__init__
+        caller = threading.get_ident()
+
+        def __init__(self, *args, **kwargs):
+            on_caller = threading.get_ident() == caller
+            if on_caller:
+                threads, cpus = plan.realtime_threads, plan.realtime_cpus
+            else:
+                threads, cpus = plan.main_threads, plan.main_cpus
+            if threads and not kwargs.get('cpu_threads'):
+                kwargs['cpu_threads'] = threads
+            previous = pin_current_thread(cpus)
+            try:
+                original(self, *args, **kwargs)
+            finally:
+                # The transcription worker only runs the final model and stays pinned
+                if on_caller and previous is not None:
+                    pin_current_thread(previous)
+
+        faster_whisper.WhisperModel.__init__ = __init__
+        try:
+            yield
+        finally:
+            faster_whisper.WhisperModel.__init__ = original
@@ -0,0 +1,172 @@
+import math
+import re
+import string
+import time
+from collections import deque
+
+# A line whose TF-IDF cosine similarity to a recent line exceeds this is a repeat
+THRESHOLD = 0.8
+# Recent lines a new line is compared against
+RECENT_COUNT = 7
+# Characters of each line that are compared
+MAX_CHARS = 100
+
+# Words as scikit-learn's TfidfVectorizer splits them: two or more word characters
+WORD = re.compile(r'(?u)\b\w\w+\b')
+# Scripts written without spaces, where a "word" is a whole clause
+UNSPACED = re.compile('[\u0e00-\u0eff\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]')
+PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+def normalize(text):
+    """Lower case, surrounding space and ASCII punctuation removed."""
+    return text.lower().strip().translate(PUNCTUATION)
+
+
+def terms(text):
+    """Hashed term counts of a normalized line.
+
+    Terms are the words TfidfVectorizer would use, except that runs of an
+    unspaced script (Japanese, Chinese, Thai, Lao) become character bigrams,
+    so two Japanese lines differing in one particle still share most terms.
+    """
+    counts = {}
+    for word in WORD.findall(text[:MAX_CHARS]):
+        if UNSPACED.search(word):
+            grams = [word[i:i + 2] for i in range(len(word) - 1)]
+        else:
+            grams = [word]
+        for gram in grams:
+            key = hash(gram)
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+class DuplicateDetector:
+    """Tells whether a line repeats one of the last few, without refitting a vectorizer.
+
+    Keeps the term counts of the last recent_count lines and how many of them
+    contain each term, updated as lines are added and fall out. A check
+    weighs terms with the same smoothed IDF and L2-normalized cosine
+    similarity as TfidfVectorizer fitted on the new line plus the recent
+    ones, so the threshold keeps its meaning, but only touches the terms of
+    at most eight short lines.
+    """
+
+    def __init__(self, threshold=THRESHOLD, recent_count=RECENT_COUNT):
+        """
+        Args:
+            threshold (float): Cosine similarity above which a line is a repeat.
+            recent_count (int): Lines kept for comparison.
+        """
+        self.threshold = threshold
+        self.lines = deque(maxlen=recent_count)
+        self.document_frequency = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add(self, text):
+        """Records a displayed line, dropping the oldest beyond recent_count."""
+        if len(self.lines) == self.lines.maxlen:
+            for term in self.lines[0]:
+                count = self.document_frequency[term] - 1
+                if count:
+                    self.document_frequency[term] = count
+                else:
+                    del self.document_frequency[term]
+        counts = terms(normalize(text))
+        self.lines.append(counts)
+        for term in counts:
+            self.document_frequency[term] = self.document_frequency.get(term, 0) + 1
+
+    def clear(self):
+        self.lines.clear()
+        self.document_frequency.clear()
+
+    def similarity(self, text):
+        """Highest cosine similarity between text and a recent line; 0.0 if none."""
+        new = terms(normalize(text))
+        if not new or not self.lines:
+            return 0.0
+        documents = len(self.lines) + 1
+        frequency = self.document_frequency
+
+        def idf(term):
+            # Smoothed as TfidfVectorizer does, counting the new line as a document
+            return math.log((1 + documents) / (1 + frequency.get(term, 0) + (term in new))) + 1
+
+        weights = {term: count * idf(term) for term, count in new.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        best = 0.0
+        for line in self.lines:
+            dot = 0.0
+            line_norm = 0.0
+            for term, count in line.items():
+                weight = count * idf(term)
+                line_norm += weight * weight
+                if term in weights:
+                    dot += weight * weights[term]
+            if dot:
+                best = max(best, dot / (norm * math.sqrt(line_norm)))
+        return best
+
+    def is_duplicate(self, text):
+        return self.similarity(text) > self.threshold
+
+
+def sklearn_is_similar(new_text, existing_lines, threshold=THRESHOLD, recent_count=RECENT_COUNT):
+    """The check the GUI used to run for every line, refitting TfidfVectorizer each time. Kept for benchmark()."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    lines = [line[:MAX_CHARS] for line in existing_lines[-recent_count:]]
+    if not lines:
+        return False
+    try:
+        vectors = TfidfVectorizer().fit_transform([new_text[:MAX_CHARS]] + lines).toarray()
+    except ValueError:
+        # Nothing but one-character words
+        return False
+    similarity = cosine_similarity(vectors)
+    return any(similarity[0][i] > threshold for i in range(1, len(similarity)))
+
+
+def benchmark(lines, recent_count=RECENT_COUNT):
+    """Runs both checks over a caption stream and returns their cost and agreement.
+
+    Each line is checked against the lines shown before it and, unless it is
+    a repeat, shown, as CaptionerGUI.addNewLine does.
+    """
+    start = time.perf_counter()
+    import sklearn.feature_extraction.text  # noqa: F401
+    import_seconds = time.perf_counter() - start
+
+    results = {}
+    decisions = {}
+    for name in ('incremental', 'sklearn'):
+        detector = DuplicateDetector(recent_count=recent_count)
+        shown = []
+        timings = []
+        decisions[name] = []
+        for line in lines:
+            start = time.perf_counter()
+            if name == 'incremental':
+                repeat = detector.is_duplicate(line)
+            else:
+                repeat = sklearn_is_similar(normalize(line), [normalize(text) for text in shown], recent_count=recent_count)
+            timings.append(time.perf_counter() - start)
+            decisions[name].append(repeat)
+            if not repeat:
+                shown.append(line)
+                detector.add(line)
+        timings.sort()
+        results[name] = {
+            'lines': len(lines),
+            'repeats': sum(decisions[name]),
+            'mean_us': 1e6 * sum(timings) / len(timings) if timings else None,
+            'p50_us': 1e6 * timings[len(timings) // 2] if timings else None,
+            'max_us': 1e6 * timings[-1] if timings else None,
+        }
+    results['sklearn']['import_seconds'] = import_seconds
+    results['agreement'] = sum(a == b for a, b in zip(decisions['incremental'], decisions['sklearn'])) / max(1, len(lines))
+    return results
@@ -0,0 +1,166 @@
+import importlib.util
+import queue
+import re
+import threading
+from collections import OrderedDict
+
+JAPANESE = re.compile(r'[぀-ゟ゠-ヿ一-鿿]')
+KANJI = re.compile(r'[一-鿿]')
+# Surface forms whose reading is remembered
+CACHE_SIZE = 4096
+
+
+def contains_japanese(text):
+    """Whether the text contains Hiragana, Katakana or Kanji."""
+    return bool(JAPANESE.search(text))
+
+
+def to_hiragana(kana):
+    """Converts Katakana to Hiragana, leaving everything else as is."""
+    return ''.join(chr(ord(c) - 0x60) if 'ァ' <= c <= 'ヶ' else c for c in kana)
+
+
+class Furigana:
+    """Adds readings to the Kanji words of Japanese lines, in a background thread.
+
+    Lines are split into words with fugashi's node API, and the Hiragana
+    reading of each Kanji surface form is kept in an LRU cache, so a
+    recurring word is looked up once. The worker tags every line waiting
+    in the queue in one pass. submit() queues a line and deliver()
+    is called from the worker thread with each annotated line and the
+    generation it was submitted in, in the order the lines were submitted.
+    discard() starts a new generation, so lines submitted before it can be
+    told apart when they arrive.
+    """
+
+    def __init__(self, deliver, cache_size=CACHE_SIZE):
+        """
+        Args:
+            deliver (callable): Takes each annotated line and its generation; called from the worker thread.
+            cache_size (int): Surface forms whose reading is cached.
+        """
+        self.deliver = deliver
+        # Found without importing it; the tagger and its dictionary load in the worker
+        self.available = importlib.util.find_spec('fugashi') is not None
+        self.tagger = None
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self.queue = queue.Queue()
+        self.thread = None
+        # Lines submitted but not yet shown; maintained by the thread that shows them
+        self.pending = 0
+        self.generation = 0
+
+    def needed(self, text):
+        return self.available and contains_japanese(text)
+
+    def reading(self, word):
+        surface = word.surface
+        reading = self.cache.get(surface)
+        if reading is not None:
+            self.cache.move_to_end(surface)
+            self.hits += 1
+            return reading
+        self.misses += 1
+        # UniDic calls the reading kana, IPADic reading; unknown words have neither
+        kana = getattr(word.feature, 'kana', None) or getattr(word.feature, 'reading', None)
+        reading = to_hiragana(kana) if kana and kana != '*' else ''
+        self.cache[surface] = reading
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return reading
+
+    def tag(self, text):
+        """Annotates one line; called with the lock held and the tagger loaded."""
+        parts = []
+        # Nodes are only valid until the next call, so they are read under the lock
+        for word in self.tagger(text):
+            surface = word.surface
+            reading = self.reading(word) if KANJI.search(surface) else ''
+            annotated = f'{surface}({reading})' if reading and reading != surface else surface
+            parts.append(word.white_space + annotated)
+        return ''.join(parts) or text
+
+    def load(self):
+        if self.tagger is None:
+            import fugashi
+            self.tagger = fugashi.Tagger()
+
+    def annotate(self, text):
+        """Returns the line with each Kanji word followed by its reading, as surface(reading)."""
+        if not self.needed(text):
+            return text
+        with self.lock:
+            self.load()
+            return self.tag(text)
+
+    def annotate_lines(self, texts):
+        """Annotates several lines in one pass, taking the lock once; a line that fails is kept as is."""
+        results = list(texts)
+        needed = [i for i, text in enumerate(texts) if self.needed(text)]
+        if not needed:
+            return results
+        with self.lock:
+            self.load()
+            for i in needed:
+                try:
+                    results[i] = self.tag(texts[i])
+                except Exception as e:
+                    print(f"Furigana processing error: {e}")
+        return results
+
+    def submit(self, text, deliver=None):
+        """Queues a line for annotation.
+
+        Args:
+            text (str): Line to annotate.
+            deliver (callable, optional): Takes the result instead of the
+                constructor's deliver. Without it, the line counts as pending
+                until delivered() is called.
+        """
+        if deliver is None:
+            self.pending += 1
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='furigana', daemon=True)
+            self.thread.start()
+        self.queue.put((text, deliver, self.generation))
+
+    def delivered(self):
+        self.pending -= 1
+
+    def discard(self):
+        """Makes the lines submitted so far stale; they still arrive, with the old generation."""
+        self.generation += 1
+
+    def run(self):
+        while True:
+            # Everything queued is tagged together, so a page of scrollback costs one pass
+            items = [self.queue.get()]
+            while items[-1] is not None:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = items[-1] is None
+            if stop:
+                items.pop()
+            texts = [text for text, _, _ in items]
+            try:
+                annotated = self.annotate_lines(texts)
+            except Exception as e:
+                print(f"Furigana processing error: {e}")
+                annotated = texts
+            for (_, deliver, generation), line in zip(items, annotated):
+                (deliver or self.deliver)(line, generation)
+            if stop:
+                return
+
+    def stats(self):
+        return {'cached': len(self.cache), 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000
+
+# Frame RMS (full scale = 1.0) below which a frame counts as silent, about -46 dBFS
+ENERGY_THRESHOLD = 0.005
+# Spectral flatness above which loud audio is treated as noise; white noise is about 0.56, voice well below 0.3
+FLATNESS_THRESHOLD = 0.5
+# Fraction of frames that must look like speech
+MIN_VOICED_FRACTION = 0.1
+
+
+class Gate:
+    """Rejects silent or noise-only segments before they reach the model.
+
+    A segment passes when enough of its 30 ms frames are loud, the loud
+    frames are not spectrally flat (broadband noise), and, with
+    aggressiveness set, enough frames are voiced according to webrtcvad.
+    Everything is computed over all frames at once with NumPy; webrtcvad
+    only runs on segments that passed the other checks.
+    """
+
+    def __init__(self, energy_threshold=ENERGY_THRESHOLD, flatness_threshold=FLATNESS_THRESHOLD,
+                 min_voiced_fraction=MIN_VOICED_FRACTION, aggressiveness=None):
+        """
+        Args:
+            energy_threshold (float): Frame RMS that counts as sound.
+            flatness_threshold (float): Median spectral flatness of loud frames that counts as noise.
+            min_voiced_fraction (float): Fraction of loud (or voiced) frames a segment needs.
+            aggressiveness (int, optional): Also require webrtcvad votes, with this aggressiveness (0-3).
+        """
+        self.energy_threshold = energy_threshold
+        self.flatness_threshold = flatness_threshold
+        self.min_voiced_fraction = min_voiced_fraction
+        self.vad = None
+        if aggressiveness is not None:
+            import webrtcvad
+            self.vad = webrtcvad.Vad(aggressiveness)
+        self.lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+        self.checked_seconds = 0.0
+        self.skipped_seconds = 0.0
+        self.reasons = {}
+
+    @staticmethod
+    def frames(samples):
+        count = len(samples) // FRAME_SAMPLES
+        return samples[:count * FRAME_SAMPLES].reshape(count, FRAME_SAMPLES)
+
+    def reason(self, samples):
+        """Returns why the segment should be skipped, or None if it should be transcribed."""
+        frames = self.frames(np.asarray(samples, dtype=np.float32))
+        if not len(frames):
+            return 'empty'
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        loud = frames[rms > self.energy_threshold]
+        if len(loud) < self.min_voiced_fraction * len(frames):
+            return 'silence'
+
+        power = np.abs(np.fft.rfft(loud * np.hanning(FRAME_SAMPLES), axis=1)) ** 2 + 1e-12
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        if np.median(flatness) > self.flatness_threshold:
+            return 'noise'
+
+        if self.vad is not None:
+            pcm = (np.clip(frames, -1.0, 1.0) * 32767).astype(np.int16)
+            voiced = sum(self.vad.is_speech(frame.tobytes(), SAMPLE_RATE) for frame in pcm)
+            if voiced < self.min_voiced_fraction * len(frames):
+                return 'no voice'
+        return None
+
+    def check(self, samples):
+        """Returns True if the segment is worth transcribing, and counts it."""
+        reason = self.reason(samples)
+        seconds = len(samples) / SAMPLE_RATE
+        with self.lock:
+            self.checked += 1
+            self.checked_seconds += seconds
+            if reason is not None:
+                self.skipped += 1
+                self.skipped_seconds += seconds
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return reason is None
+
+    def stats(self):
+        with self.lock:
+            return {
+                'checked': self.checked,
+                'skipped': self.skipped,
+                'checked_seconds': self.checked_seconds,
+                'skipped_seconds': self.skipped_seconds,
+                'reasons': dict(self.reasons),
+            }
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Gate skipped {stats['skipped']} of {stats['checked']} segments "
+                f"({stats['skipped_seconds']:.1f} s of {stats['checked_seconds']:.1f} s audio)")
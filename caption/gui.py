@@ -1,20 +1,26 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QLabel, QWidget, QStyleOption, QStyle, QScrollArea, QDesktopWidget, QShortcut, QSizePolicy
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QLabel, QWidget, QStyleOption, QStyle, QPlainTextEdit, QFrame, QDesktopWidget, QShortcut, QSizePolicy
 from PyQt5.QtCore import Qt, QRect, QSize, QPoint, pyqtSignal, pyqtSlot, QEvent, QMetaObject, Q_ARG
-from PyQt5.QtGui import QPainter, QColor, QCursor, QKeySequence, QTextDocument
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from PyQt5.QtGui import QPainter, QColor, QCursor, QKeySequence, QTextDocument, QTextCursor
 import textwrap
+import html
 
-import string
 import os
-import re
+from collections import deque
+import caption.store as store
+import caption.dedup as dedup
+import caption.furigana as furigana
+from caption.startup import timer
+from caption.metrics import metrics
 class CaptionerGUI(QMainWindow):
     mousePressPos = None
     mouseMovePos = None
 
     clearSignal = pyqtSignal()
-    newLineSignal = pyqtSignal(str)
+    newLineSignal = pyqtSignal(object)
+    partialLineSignal = pyqtSignal(object)
+    annotatedLineSignal = pyqtSignal(str, int)
+    annotatedBlockSignal = pyqtSignal(int, int, str)
     zoomInSignal = pyqtSignal()
     zoomOutSignal = pyqtSignal()
     moveMonitorSignal = pyqtSignal()
@@ -26,7 +32,12 @@ class CaptionerGUI(QMainWindow):
     changeSettingsSignal = pyqtSignal()
     def __init__(self):
         super().__init__()
-        self.newLineSignal.connect(self.addNewLine)
+        # Emitted from the event bus thread, which waits until the line is shown,
+        # so a busy GUI thread backs up the bus queue instead of Qt's
+        self.newLineSignal.connect(self.addNewLine, Qt.BlockingQueuedConnection)
+        self.partialLineSignal.connect(self.updateLiveLine, Qt.BlockingQueuedConnection)
+        self.annotatedLineSignal.connect(self.showAnnotatedLine)
+        self.annotatedBlockSignal.connect(self.patchAnnotatedBlock)
         self.zoomInSignal.connect(self.zoomIn)
         self.zoomOutSignal.connect(self.zoomOut)
         self.moveMonitorSignal.connect(self.move_monitor)
@@ -36,7 +47,21 @@ class CaptionerGUI(QMainWindow):
         self.resizeWidthSignal.connect(self.resizeWidth)
         self.resizeHeightSignal.connect(self.resizeHeight)
         self.changeSettingsSignal.connect(self.changeSettings)
-        self.lines = []
+        # Lines shown while following the live captions; older ones are read
+        # back from the session log for scrollback
+        self.lines = deque(maxlen=store.DEFAULT_WINDOW)
+        # First session log entry in the view while scrolled back, None while following
+        self.scrollback = None
+        # Counts the scrollback pages shown, so annotations for an old page are dropped
+        self.page_generation = 0
+        self.paging = False
+        self.duplicates = dedup.DuplicateDetector()
+        # Partial hypothesis of the utterance in progress, shown after the final lines
+        self.live_line = ''
+        # Sequence of the last final line received; older partials are stale
+        self.line_sequence = 0
+        # Whether the last block of the caption view holds the live line
+        self.live_shown = False
         self.fontSize = 55
         self.alpha = 128
         self.lineLimit = 0
@@ -57,16 +82,11 @@ class CaptionerGUI(QMainWindow):
         self.recording_enabled = True
         self.initUI()
 
-        # Check if required library for Japanese text processing is available
-        self.japanese_processing_available = False
-        try:
-            import fugashi  # Japanese morphological analyzer
-            import jaconv   # Japanese converter
-            self.japanese_processing_available = True
-            self.tagger = fugashi.Tagger()  # Initialize Japanese morphological analyzer
-        except ImportError:
-            print("Note: Japanese text processing requires 'fugashi' and 'jaconv' libraries.")
-            print("Install with: pip install fugashi jaconv")
+        # Japanese lines get their readings in a background thread
+        self.furigana = furigana.Furigana(self.annotatedLineSignal.emit)
+        if not self.furigana.available:
+            print("Note: Japanese text processing requires the 'fugashi' library.")
+            print("Install with: pip install fugashi unidic-lite")
 
     def initUI(self):
         self.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
@@ -77,20 +97,18 @@ class CaptionerGUI(QMainWindow):
         layout.setContentsMargins(0, 0, 0, 0)  # Set margins to zero
         layout.setSpacing(0)  # Set spacing to zero
         
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
-        self.scroll_area.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-
-        self.caption_label = QLabel("Caption goes here")
-        self.caption_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
-        self.caption_label.setWordWrap(True)
-        self.caption_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
-        self.caption_label.setCursor(Qt.IBeamCursor)
-        self.caption_label.setTextFormat(Qt.RichText)  # Enable HTML formatting for ruby tags
-
-        self.scroll_area.setWidget(self.caption_label)
-        layout.addWidget(self.scroll_area)
+        # One block per line; appending lays out only the new block, and the
+        # oldest blocks are dropped beyond the maximum block count
+        self.caption_view = QPlainTextEdit()
+        self.caption_view.setReadOnly(True)
+        self.caption_view.setFrameShape(QFrame.NoFrame)
+        self.caption_view.setPlaceholderText("Caption goes here")
+        self.caption_view.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.caption_view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.caption_view.viewport().setCursor(Qt.IBeamCursor)
+        self.set_line_limit(self.lineLimit)
+
+        layout.addWidget(self.caption_view)
 
         self.styling()
         self.setCentralWidget(central_widget)
@@ -179,9 +197,9 @@ class CaptionerGUI(QMainWindow):
         fullheight_shortcut = QShortcut(QKeySequence(Qt.Key_H), self)
         fullheight_shortcut.activated.connect(self.fullheight)
         
-        self.scroll_area.verticalScrollBar().setVisible(False)
-        self.previous_value = self.scroll_area.verticalScrollBar().value()
-        self.scroll_area.verticalScrollBar().valueChanged.connect(self.new_scroll)
+        self.caption_view.verticalScrollBar().setVisible(False)
+        self.previous_value = self.caption_view.verticalScrollBar().value()
+        self.caption_view.verticalScrollBar().valueChanged.connect(self.new_scroll)
         QApplication.instance().installEventFilter(self)
 
     def showEvent(self, event):
@@ -392,30 +410,8 @@ class CaptionerGUI(QMainWindow):
             return
 
         try:
-            # Stop the current recorder safely
-            self.speech.stop = True
-            if self.speech.recorder:
-                try:
-                    self.speech.recorder.stop()
-                except:
-                    pass  # Ignore errors during stop
-                self.speech.recorder = None
-
-            # Update the settings
-            self.speech.args['model_name'] = model_name
-            self.speech.args['lang'] = language
-            self.speech.recording_scale = time_scale
-
-            # Update the minimum length calculation
-            self.speech.min_length = self.speech.get_min_length_of_recording()
-
-            # Restart the transcription thread with new settings
-            import threading
-            self.speech.stop = False
-            transcription_thread = threading.Thread(target=self.speech.main_program)
-            transcription_thread.daemon = True
-            transcription_thread.start()
-
+            # Captions keep flowing from the current recorder while the new one loads
+            self.speech.switch(model_name, language, time_scale)
         except Exception as e:
             print(f"Error restarting audio recorder: {e}")
 
@@ -446,17 +442,84 @@ class CaptionerGUI(QMainWindow):
     def transparencySub(self):
         self.transparency(-self.transparencyFactor)
     def toBottom(self):
-        max_value = self.scroll_area.verticalScrollBar().maximum()
-        current_value = self.scroll_area.verticalScrollBar().value()
+        if self.scrollback is not None:
+            self.leave_scrollback()
+        max_value = self.caption_view.verticalScrollBar().maximum()
+        current_value = self.caption_view.verticalScrollBar().value()
         self.write('toBottom ', self.previous_value, current_value, max_value)
-        self.scroll_area.verticalScrollBar().setValue(max_value)
+        self.caption_view.verticalScrollBar().setValue(max_value)
         self.previous_value = max_value
     def toTop(self):
         """
         Scroll to the top of the text area.
         """
         self.write("toTop")
-        self.scroll_area.verticalScrollBar().setValue(0)
+        # The log only adds anything once it holds more lines than the view
+        if self.log is not None and self.log.line_count() > len(self.lines):
+            self.show_scrollback(0)
+        self.caption_view.verticalScrollBar().setValue(0)
+
+    def show_scrollback(self, start, top=None):
+        """Fills the view with one page of the session log from entry start on.
+
+        Args:
+            start (int): First log entry to show.
+            top (int, optional): Log entry to scroll to the top of the view.
+        """
+        page = self.lines.maxlen
+        start = max(0, min(start, self.log.line_count() - page))
+        self.paging = True
+        self.scrollback = start
+        self.page_generation += 1
+        self.caption_view.clear()
+        self.set_live_shown(False)
+        for number, line in enumerate(self.log.read_lines(start, start + page)):
+            self.caption_view.appendHtml(html.escape(line))
+            if self.furigana.needed(line):
+                # Shown as is now; the reading replaces the block once the worker has it
+                def deliver(text, generation, page=self.page_generation, number=number):
+                    self.annotatedBlockSignal.emit(page, number, text)
+                self.furigana.submit(line, deliver)
+        if top is not None:
+            block = self.caption_view.document().findBlockByNumber(top - start)
+            self.caption_view.verticalScrollBar().setValue(block.firstLineNumber())
+        self.paging = False
+
+    def leave_scrollback(self):
+        """Goes back to the live captions."""
+        self.scrollback = None
+        self.page_generation += 1
+        self.render_lines()
+
+    @pyqtSlot(int, int, str)
+    def patchAnnotatedBlock(self, page, number, text):
+        """Replaces a scrollback line with its annotated text, if its page is still shown."""
+        if page != self.page_generation or self.scrollback is None:
+            return
+        block = self.caption_view.document().findBlockByNumber(number)
+        if not block.isValid():
+            return
+        cursor = QTextCursor(block)
+        cursor.movePosition(QTextCursor.EndOfBlock, QTextCursor.KeepAnchor)
+        cursor.insertText(text)
+
+    def page_scrollback(self, current_value, max_value):
+        """Pages in the neighbouring half page of the log when the view is scrolled to either end."""
+        if max_value == 0:
+            # The whole page fits in the view, so there is nothing to page through
+            self.toBottom()
+            return
+        page = self.lines.maxlen
+        # The log entry at the top of the view stays there across the page change
+        top = self.scrollback + self.caption_view.cursorForPosition(QPoint(0, 0)).blockNumber()
+        if current_value == 0 and self.scrollback > 0:
+            self.show_scrollback(self.scrollback - page // 2, top)
+        elif current_value == max_value:
+            if self.scrollback + self.caption_view.document().blockCount() >= self.log.line_count():
+                # Past the newest logged line: follow the live captions again
+                self.toBottom()
+            else:
+                self.show_scrollback(self.scrollback + page // 2, top)
     def end(self):
         #print(self.speech)
         self.write("End")
@@ -510,16 +573,23 @@ class CaptionerGUI(QMainWindow):
     @pyqtSlot()
     def clear(self):
         if self:
-            self.lines = []
-            self.caption_label.setText("")
-            self.log.write_log('-- Clear --')
+            self.lines.clear()
+            self.scrollback = None
+            self.duplicates.clear()
+            # Lines still being annotated were submitted before the clear
+            self.furigana.discard()
+            self.live_line = ''
+            self.caption_view.clear()
+            self.set_live_shown(False)
+            if self.speech:
+                self.speech.bus.publish('clear')
             #self.clearCaption()
     # Show the scrollbar when the content is larger than the viewport
     def scrollbar_visibility(self):
-        if self.scroll_area.verticalScrollBar().isVisible():
-            self.scroll_area.verticalScrollBar().setVisible(True)
+        if self.caption_view.verticalScrollBar().isVisible():
+            self.caption_view.verticalScrollBar().setVisible(True)
         else:
-            self.scroll_area.verticalScrollBar().setVisible(False)
+            self.caption_view.verticalScrollBar().setVisible(False)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -556,8 +626,7 @@ class CaptionerGUI(QMainWindow):
 
     def styling(self):
         self.write("Style change ", self.fontSize, self.alpha)
-        self.scroll_area.setStyleSheet(f"font-size: {self.fontSize}px; color: white; background-color: rgba(0, 0, 0, {self.alpha});")
-        self.caption_label.setStyleSheet(f"background-color: rgba(0, 0, 0, {self.alpha});")
+        self.caption_view.setStyleSheet(f"font-size: {self.fontSize}px; color: white; background-color: rgba(0, 0, 0, {self.alpha});")
 
     @pyqtSlot(bool)
     def updateRecordingStatus(self, enabled):
@@ -565,6 +634,7 @@ class CaptionerGUI(QMainWindow):
         self.update()
 
     def paintEvent(self, event):
+        timer.mark('gui_first_paint')
         opt = QStyleOption()
         opt.initFrom(self)
         painter = QPainter(self)
@@ -579,176 +649,139 @@ class CaptionerGUI(QMainWindow):
             painter.drawEllipse(self.width() - radius * 2 - margin, margin, radius * 2, radius * 2)
 
     def editCaption(self, new_caption):
-        self.caption_label.setText(new_caption)
+        self.caption_view.setPlainText(new_caption)
+        self.set_live_shown(False)
 
     def clearCaption(self):
-        self.caption_label.clear()
+        self.caption_view.clear()
+        self.set_live_shown(False)
+
+    def set_line_limit(self, limit):
+        """Sets how many final lines the caption view keeps; 0 keeps store.DEFAULT_WINDOW."""
+        self.lineLimit = limit
+        window = limit if limit > 0 else store.DEFAULT_WINDOW
+        self.lines = deque(self.lines, maxlen=window)
+        self.set_live_shown(self.live_shown)
+        if self.scrollback is None:
+            # Changing the limit drops blocks but never brings kept lines back
+            self.render_lines()
 
     @pyqtSlot()
     def call_adjust_size(self):
-        self.caption_label.adjustSize()
-        self.max_value = self.scroll_area.verticalScrollBar().maximum()
-        self.scroll_area.verticalScrollBar().setValue(self.max_value)
+        self.max_value = self.caption_view.verticalScrollBar().maximum()
+        self.caption_view.verticalScrollBar().setValue(self.max_value)
     
-    def normalize_text(self, text):
-        # Normalize the text: lower case, strip spaces, and remove punctuation
-        return text.lower().strip().translate(str.maketrans('', '', string.punctuation))
-
-    def is_similar(self, new_text, existing_lines, threshold=0.8, recent_count=7):
-        # Limit text length to prevent performance issues with large texts
-        if len(new_text) > 100:  # Limit to first 100 characters for comparison
-            new_text = new_text[:100]
-
-        # Get the most recent lines
-        recent_lines = existing_lines[-recent_count:]
-
-        # Limit length of existing lines too
-        limited_lines = []
-        for line in recent_lines:
-            if len(line) > 100:
-                limited_lines.append(line[:100])
-            else:
-                limited_lines.append(line)
+    @pyqtSlot(object)
+    def addNewLine(self, segment):
+        text = str(segment)
+        # The final text replaces the live line
+        self.live_line = ''
+        self.line_sequence = max(self.line_sequence, getattr(segment, 'sequence', 0))
+        # Drop lines that repeat one of the last few shown
+        if self.duplicates.is_duplicate(text):
+            metrics.lines.inc(state='deduplicated')
+            self.remove_live_block()
+            return
+        self.duplicates.add(text)
 
-        # Only proceed if there are lines to compare
-        if not limited_lines:
-            return False
+        # Japanese lines get furigana in the background; lines behind one
+        # wait their turn so the order is kept
+        if self.furigana.needed(text) or self.furigana.pending:
+            self.furigana.submit(text)
+        else:
+            self.show_line(text)
 
-        try:
-            vectorizer = TfidfVectorizer().fit_transform([new_text] + limited_lines)
-            vectors = vectorizer.toarray()
-            csim = cosine_similarity(vectors)
-            return any(csim[0][i] > threshold for i in range(1, len(csim)))
-        except:
-            # If similarity checking fails, return False to allow text to be added
-            return False
-    
-    @pyqtSlot(str)
-    def addNewLine(self, text):
-        if len(self.lines) > 0:
-            # Normalize the incoming text
-            normalized_text = self.normalize_text(text)
-            # Create a list of normalized lines for similarity checking
-            # Only check against a limited number of recent lines to avoid performance issues
-            recent_lines = self.lines[-20:]  # Only check last 20 lines
-            normalized_lines = [self.normalize_text(line) for line in recent_lines]
-
-            # Check for similarity with existing lines
-            if self.is_similar(normalized_text, normalized_lines):
-                return
-
-        # Process text for furigana if it's Japanese
-        processed_text = self.process_text_with_furigana(text)
+    @pyqtSlot(str, int)
+    def showAnnotatedLine(self, processed_text, generation):
+        self.furigana.delivered()
+        if generation != self.furigana.generation:
+            # Submitted before the captions were cleared
+            return
+        self.show_line(processed_text)
 
+    def show_line(self, processed_text):
         # Handle text length limit and specific languages
         #if len(text) > self.textLimit and self.language not in ['zh-CN', 'zh-TW', 'ja', 'th', 'my', 'lo', 'km', 'bo', 'mn', 'mn-Mong', 'dz', 'aii']:
             # Split the text into multiple lines without splitting words
         #    lines = textwrap.wrap(text, width=self.textLimit, break_long_words=False)
         #    self.lines.extend(lines)
         #else:
+        # The caption view keeps at most lineLimit lines;
+        # older lines stay in the on-disk history for scrollback and export
         self.lines.append(processed_text)
+        metrics.lines.inc(state='displayed')
+        if self.scrollback is not None:
+            # The view shows the log; the line is there when the user comes back
+            return
 
-        # Ensure the number of lines does not exceed the limit
-        if self.lineLimit > 0:
-            while len(self.lines) > self.lineLimit:
-                del self.lines[0]
-
-        # Use setTextFormat to support HTML content with ruby tags
-        self.caption_label.setText('\n'.join(self.lines))
-        # Write log in a separate thread to avoid blocking the UI
-        if self.log:
-            QMetaObject.invokeMethod(self, "_write_log", Qt.QueuedConnection,
-                                    Q_ARG(str, text))
+        self.remove_live_block()
+        self.caption_view.appendHtml(html.escape(processed_text))
+        # The next utterance may have started while this line was annotated
+        if self.live_line:
+            self.append_live_line()
         self.update_scroll_position()
 
-    def contains_japanese(self, text):
-        """
-        Checks if the text contains Japanese characters (Hiragana, Katakana, Kanji).
-        """
-        # Regular expression to match Japanese characters
-        japanese_pattern = re.compile(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]')
-        return bool(japanese_pattern.search(text))
+    @pyqtSlot(object)
+    def updateLiveLine(self, segment):
+        """Shows the latest partial hypothesis in place of the previous one."""
+        if getattr(segment, 'sequence', 0) < self.line_sequence:
+            # Published before a final line that has already replaced it
+            return
+        self.live_line = str(segment)
+        if self.scrollback is not None:
+            return
+        self.remove_live_block()
+        if self.live_line:
+            self.append_live_line()
+        self.update_scroll_position()
 
-    def add_furigana_ruby_html(self, text):
-        """
-        Adds furigana to Japanese text using HTML ruby tags or fallback format.
-        """
-        if not self.japanese_processing_available:
-            return text
+    def set_live_shown(self, shown):
+        """Records whether the live line is shown; the view keeps one block more only while it is."""
+        self.live_shown = shown
+        self.caption_view.setMaximumBlockCount(self.lines.maxlen + (1 if shown else 0))
 
-        try:
-            # Use the tagger to analyze the text
-            result = self.tagger.parse(text)
-            processed_parts = []
-
-            for line in result.split("\n"):
-                if line.strip() == "EOS" or line.strip() == "":
-                    continue
-
-                parts = line.split("\t")
-                if len(parts) < 2:
-                    continue
-
-                surface = parts[0]  # The surface form (what you see)
-                feature_str = parts[1]  # The feature string
-
-                # Parse the feature string
-                features = feature_str.split(",")
-
-                # Extract the reading (yomi) - typically in position 7 for UniDic
-                # For different dictionaries, it might be different positions
-                if len(features) > 7 and features[7] and features[7] != "*" and features[7] != surface:
-                    # Get the reading
-                    reading = features[7]
-
-                    # Check if the surface form contains kanji
-                    if self.contains_japanese(surface) and any('\u4e00' <= c <= '\u9fff' for c in surface):
-                        # Qt's HTML support for ruby tags might be limited
-                        # Using a more compatible format that shows furigana clearly
-                        processed_parts.append(f'{surface}({reading})')
-                        # Keep HTML ruby as comment for when better support is available
-                        # processed_parts.append(f'<ruby>{surface}<rt>{reading}</rt></ruby>')
-                    else:
-                        processed_parts.append(surface)
-                else:
-                    # No reading available, just add the surface
-                    processed_parts.append(surface)
-
-            # Join the processed parts
-            return "".join(processed_parts) if processed_parts else text
-        except Exception as e:
-            # If processing fails, return the original text
-            print(f"Furigana processing error: {e}")
-            return text
+    def append_live_line(self):
+        self.set_live_shown(True)
+        self.caption_view.appendHtml(f'<span style="color: gray;">{html.escape(self.live_line)}</span>')
 
-    def process_text_with_furigana(self, text):
-        """
-        Process text to add furigana if it contains Japanese characters.
-        """
-        if self.contains_japanese(text):
-            return self.add_furigana_ruby_html(text)
-        return text
+    def remove_live_block(self):
+        """Removes the live line, the last block of the caption view, if it is shown."""
+        if not self.live_shown:
+            return
+        cursor = QTextCursor(self.caption_view.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+        # Take the line break before it too, unless it is the only block
+        cursor.movePosition(QTextCursor.PreviousCharacter, QTextCursor.KeepAnchor)
+        cursor.removeSelectedText()
+        self.set_live_shown(False)
+
+    def render_lines(self):
+        """Rebuilds the caption view from the recent lines, e.g. after the line limit changed."""
+        self.caption_view.clear()
+        self.set_live_shown(False)
+        for line in self.lines:
+            self.caption_view.appendHtml(html.escape(line))
+        if self.live_line:
+            self.append_live_line()
 
-    @pyqtSlot(str)
-    def _write_log(self, text):
-        """Thread-safe method to write log"""
-        if self.log:
-            self.log.write_log(f'{text}')
     def new_scroll(self) -> None:
-        current_value = self.scroll_area.verticalScrollBar().value()
-        max_value = self.scroll_area.verticalScrollBar().maximum()
+        current_value = self.caption_view.verticalScrollBar().value()
+        max_value = self.caption_view.verticalScrollBar().maximum()
+        if self.scrollback is not None:
+            if not self.paging:
+                self.page_scrollback(current_value, max_value)
+            return
         if current_value == max_value:
             self.previous_value = max_value
     def update_scroll_position(self):
         self.scrolling = True
-        caption_height = self.caption_label.height()
-        viewport_height = self.scroll_area.viewport().height()
-        # Check if the caption label height exceeds the viewport height
-        
-        if caption_height > viewport_height:
+        scroll_bar = self.caption_view.verticalScrollBar()
+        # The view only scrolls once the lines exceed the viewport height
+        if scroll_bar.maximum() > 0:
             # Get the current scroll bar value and the maximum value
-            current_value = self.scroll_area.verticalScrollBar().value()
-            max_value = self.scroll_area.verticalScrollBar().maximum()
+            current_value = scroll_bar.value()
+            max_value = scroll_bar.maximum()
             # If the scroll bar is already at the bottom, update the value to the maximum
             if current_value == max_value:
                 QMetaObject.invokeMethod(self, "call_adjust_size", Qt.QueuedConnection)
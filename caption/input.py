@@ -13,6 +13,7 @@ class Input:
             '<ctrl>+<shift>+=': self.increase_font_size,
             '<ctrl>+<shift>+-': self.decrease_font_size,
             '<ctrl>+<alt>+x': self.clear_text,
+            '<ctrl>+<alt>+p': self.toggle_profiler,
 #            '<ctrl>+<shift>+<left>': self.move_monitor,
 #            '<ctrl>+<shift>+<down>': self.toggle_top,
             '<ctrl>+<page_up>': self.increase_transparency,
@@ -31,6 +32,11 @@ class Input:
         if self.gui and self.gui.speech:
             self.gui.speech.toggle_recording()
 
+    def toggle_profiler(self):
+        """Start or stop the sampling profiler."""
+        if self.gui and self.gui.speech:
+            self.gui.speech.profiler.toggle()
+
     def reload(self):
         """Reload the application."""
         os.execv(sys.executable, ['py'] + self.args)
@@ -1,7 +1,11 @@
 import os
+from array import array
 from datetime import date, datetime
+import threading
 import time
 
+from caption.metrics import metrics
+
 class Log:
     """A class for logging messages to a file with date management."""
 
@@ -19,8 +23,16 @@ class Log:
         self.test_name = test
         self.file = None
         self.test = None
+        self.directory = None  # Logs/YYYY/MM/DD of the current log file
         self.current_date = None  # Track the current date
         self.encoding = 'utf-8'  # Specify the encoding
+        # Offset index of the entries written this session, for read_lines();
+        # entries may span several files when the date changes
+        self.paths = []
+        self.offsets = array('Q')
+        self.lengths = array('I')
+        self.entry_files = array('H')
+        self.index_lock = threading.Lock()
 
         # For the new system, we don't need to search for existing files with similar names
         # Each log file will have a unique timestamp in its name
@@ -70,6 +82,8 @@ class Log:
             # Fallback to original directory
             log_dir_path = self.create_log_dir()
 
+        self.directory = log_dir_path
+
         # Format filename as: day-hh-mm-ss_modelname.log
         time_part = now.strftime("%d-%H-%M-%S")
         self.file_path = os.path.join(log_dir_path, f"{time_part}_{self.filename}.log")
@@ -96,16 +110,19 @@ class Log:
 
             # Set the current date after creating the log file
             self.current_date = today
+            with self.index_lock:
+                self.paths.append(self.file_path)
         except Exception as e:
             print(f"Could not create log file: {e}")
             self.file = None
 
-    def write_log(self, message, file=None):
+    def write_log(self, message, file=None, indexed=True):
         """Writes a message to the log file or a specified file.
 
         Args:
-            message (str): The message to log.
+            message (str or Segment): The message to log. A Segment is stamped with the time its speech ended.
             file (file object, optional): The file to write to. Defaults to self.file.
+            indexed (bool): Whether read_lines() can read the message back.
         """
         if file is None:
             file = self.file
@@ -117,10 +134,17 @@ class Log:
         # Check if the date has changed
         current_date = date.today()
         if current_date != self.current_date:
+            old_file, old_test = self.file, self.test
             self.close_log_file()  # Close the old log file
             self.create_log_file()  # Create a new log file
+            # The message goes to the new day's file, not the one just closed
+            if file is old_file:
+                file = self.file
+            elif file is old_test:
+                file = self.test
 
-        current_time = datetime.now().strftime("%H:%M:%S")
+        moment = datetime.fromtimestamp(message.wall_time()) if hasattr(message, 'wall_time') else datetime.now()
+        current_time = moment.strftime("%H:%M:%S")
         
         try:
             # Check if the file is closed and attempt to reopen if it is
@@ -132,8 +156,16 @@ class Log:
             if file is None or file.closed:
                 return
                 
+            started = time.perf_counter()
+            offset = file.tell()
             file.write(f"{current_time} {message}\n")
             file.flush()  # Ensure data is written to disk
+            if file is self.file and indexed:
+                with self.index_lock:
+                    self.offsets.append(offset)
+                    self.lengths.append(file.tell() - offset)
+                    self.entry_files.append(len(self.paths) - 1)
+            metrics.log_write.observe(time.perf_counter() - started)
         except Exception as e:
             # Silently handle errors to prevent app crashes
             print(f"Error writing to log file: {e}")
@@ -142,6 +174,49 @@ class Log:
             except:
                 pass
 
+    def line_count(self):
+        """Number of indexed entries written to the session log so far."""
+        return len(self.offsets)
+
+    def read_lines(self, start, stop):
+        """Reads back the entries with index start <= i < stop, without their time stamps.
+
+        Only the offset of each entry is kept in memory; the text comes from
+        the log files, so any part of a long session can be paged in.
+        """
+        with self.index_lock:
+            stop = min(stop, len(self.offsets))
+            if start >= stop:
+                return []
+            offsets = self.offsets[start:stop]
+            lengths = self.lengths[start:stop]
+            files = self.entry_files[start:stop]
+            paths = list(self.paths)
+        lines = []
+        index = 0
+        count = stop - start
+        while index < count:
+            number = files[index]
+            last = index
+            while last + 1 < count and files[last + 1] == number:
+                last += 1
+            # One read per file; entries not indexed may lie between these
+            begin = offsets[index]
+            finish = offsets[last] + lengths[last]
+            try:
+                with open(paths[number], 'rb') as file:
+                    file.seek(begin)
+                    data = file.read(finish - begin)
+            except OSError as e:
+                print(f"Could not read log file: {e}")
+                data = b''
+            for entry in range(index, last + 1):
+                chunk = data[offsets[entry] - begin:offsets[entry] + lengths[entry] - begin]
+                # Entries start with "HH:MM:SS "
+                lines.append(chunk.decode(self.encoding, errors='replace').rstrip('\r\n')[9:])
+            index = last + 1
+        return lines
+
     def close_log_file(self):
         """Closes the current log file."""
         try:
@@ -0,0 +1,198 @@
+import os
+import threading
+import weakref
+from bisect import bisect_left
+
+from caption.startup import max_rss_mb
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+WRITE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Counter:
+    """A value that only goes up, optionally split by labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, dict(key), value) for key, value in self.values.items()]
+
+
+class Gauge(Counter):
+    """A value that is set, or read from a callback when scraped.
+
+    The callback returns a number, or a {label value: number} dict for the
+    label named `label`.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help, callback=None, label=None, kind='gauge'):
+        super().__init__(name, help)
+        self.callback = callback
+        self.label = label
+        # A callback may report a counter kept elsewhere
+        self.kind = kind
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def samples(self):
+        if self.callback is None:
+            return super().samples()
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, {self.label: key}, item) for key, item in value.items()]
+        return [(self.name, {}, value)]
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        with self.lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    def samples(self):
+        with self.lock:
+            if not self.count:
+                return []
+            samples = []
+            total = 0
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                samples.append((self.name + '_bucket', {'le': format_value(bound)}, total))
+            samples.append((self.name + '_sum', {}, self.sum))
+            samples.append((self.name + '_count', {}, self.count))
+            return samples
+
+
+def rss_bytes():
+    """Current resident set size, or the peak where the current one is unavailable."""
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        peak = max_rss_mb()
+        return peak * 1024 * 1024 if peak is not None else None
+
+
+class Metrics:
+    """Pipeline health metrics in the Prometheus text format, served at /metrics.
+
+    Metrics nothing has reported yet are left out. The event queues and
+    audio backlog are read at scrape time from every watched Speech, so
+    several instances (e.g. the runs of a benchmark sweep) add up instead
+    of the last one replacing the others. Multi-stream runs (--stream) do
+    not go through Speech and report none of these.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        # Speech instances read at scrape time; collected ones drop out
+        self.pipelines = weakref.WeakSet()
+        self.recognition_latency = self.add(Histogram(
+            'captioner_recognition_latency_seconds', 'End of speech to final text, per utterance.'))
+        self.transcribe_seconds = self.add(Histogram(
+            'captioner_transcribe_seconds', 'Model time per utterance.'))
+        self.realtime_factor = self.add(Gauge(
+            'captioner_realtime_factor', 'Model time over audio duration of the last utterance.'))
+        self.audio_backlog = self.add(Gauge(
+            'captioner_audio_backlog_seconds', 'Audio captured but not yet processed by the recognizer.',
+            self.audio_backlog_seconds))
+        self.lines = self.add(Counter(
+            'captioner_lines_total', 'Final lines by outcome: published, deduplicated or displayed.'))
+        self.gate_skipped = self.add(Counter(
+            'captioner_gate_skipped_total', 'Segments the silence and noise gate kept from the model.'))
+        self.queue_depth = self.add(Gauge(
+            'captioner_event_queue_depth', 'Events waiting per event bus subscriber.',
+            lambda: self.bus_totals('queued'), label='subscriber'))
+        self.queue_dropped = self.add(Gauge(
+            'captioner_event_queue_dropped_total', 'Events dropped per event bus subscriber.',
+            lambda: self.bus_totals('dropped'), label='subscriber', kind='counter'))
+        self.log_write = self.add(Histogram(
+            'captioner_log_write_seconds', 'Time to write and flush one log line.', WRITE_BUCKETS))
+        self.rss = self.add(Gauge(
+            'captioner_process_resident_memory_bytes', 'Resident set size of the process.', rss_bytes))
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def watch(self, speech):
+        """Reports the event queues and audio backlog of a Speech until unwatch()."""
+        self.pipelines.add(speech)
+
+    def unwatch(self, speech):
+        self.pipelines.discard(speech)
+
+    def bus_totals(self, field):
+        """A bus stats field summed per subscriber name over the watched instances."""
+        totals = {}
+        for speech in list(self.pipelines):
+            for name, stats in speech.bus.stats().items():
+                totals[name] = totals.get(name, 0) + stats[field]
+        return totals
+
+    def audio_backlog_seconds(self):
+        backlogs = [speech.audio_backlog() for speech in list(self.pipelines)]
+        backlogs = [seconds for seconds in backlogs if seconds is not None]
+        return sum(backlogs) if backlogs else None
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -0,0 +1,234 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+import caption.backend as backend
+import caption.gate as gate
+import caption.log as log
+import caption.store as store
+import caption.vad as vad
+from caption.ringbuffer import RingBuffer
+import caption.scheduler as scheduler
+from caption.registry import registry, estimate_size_mb
+from caption.segment import Segment
+
+SAMPLE_RATE = vad.SAMPLE_RATE
+# Audio kept before the first speech frame so word onsets are not clipped
+PRE_ROLL = SAMPLE_RATE // 5
+# Whisper sees at most 30 s at a time
+MAX_UTTERANCE = 28.0
+# Audio kept per stream; utterances waiting longer than this for the model are lost
+RING_SECONDS = 60
+
+
+def parse_stream(spec, number):
+    """Splits an "ID=SOURCE" spec; streams without an ID are numbered s1, s2, ..."""
+    stream_id, sep, source = spec.partition('=')
+    if not sep:
+        return f"s{number}", spec
+    return stream_id, source
+
+
+def create_source(source):
+    """Like backend.create_source, but 'mic' reads the default device here so several can run."""
+    if source in ('', 'mic'):
+        return backend.DeviceSource(None)
+    return backend.create_source({'source': source})
+
+
+class SharedModel:
+    """One faster-whisper model transcribing for every stream.
+
+    CTranslate2 runs up to num_workers transcriptions in parallel on a
+    single copy of the weights, so each extra stream costs only its audio
+    buffers and threads.
+    """
+
+    def __init__(self, model_name, compute_type='default', lang=None, workers=1):
+        self.lang = lang
+        self.key = (model_name, 'shared', compute_type, 'cpu', workers)
+
+        def load():
+            from faster_whisper import WhisperModel
+            return WhisperModel(model_name, device='cpu', compute_type=compute_type, num_workers=workers)
+
+        self.model, _ = registry.acquire(self.key, load, estimate_size_mb(model_name, compute_type))
+        self.batch = None
+
+    def transcribe(self, samples):
+        segments, info = self.model.transcribe(samples, language=self.lang, beam_size=5)
+        return ' '.join(segment.text.strip() for segment in segments), info.language
+
+    def transcribe_batch(self, utterances):
+        if len(utterances) == 1:
+            return [self.transcribe(utterances[0])]
+        if self.batch is None:
+            self.batch = scheduler.batched_transcriber(self.model, self.lang)
+        return self.batch(utterances)
+
+    def close(self):
+        registry.release(self.model)
+
+
+class StubModel:
+    """Stands in for SharedModel with --backend stub: reports the utterance length."""
+
+    def __init__(self, lang=None):
+        self.lang = lang
+
+    def transcribe(self, samples):
+        return f"{len(samples) / SAMPLE_RATE:.1f}s of speech", self.lang
+
+    def transcribe_batch(self, utterances):
+        return [self.transcribe(samples) for samples in utterances]
+
+    def close(self):
+        pass
+
+
+class Stream:
+    """One audio source with its own voice activity state, transcript and log.
+
+    A reader thread cuts the source into utterances; a transcriber thread
+    sends them to the shared model in order.
+    """
+
+    def __init__(self, stream_id, source, model, args, min_length=0.3, post_silence=0.5):
+        """
+        Args:
+            stream_id (str): Tag for the log file name and printed lines.
+            source (AudioSource): Where the audio comes from.
+            model (SharedModel or BatchScheduler): Model shared with the other streams.
+            args (dict): Captioner arguments, for the log.
+            min_length (float): Shortest utterance (seconds) worth transcribing.
+            post_silence (float): Silence (seconds) that ends an utterance.
+        """
+        self.id = stream_id
+        self.source = source
+        self.model = model
+        self.gate = gate.Gate(aggressiveness=args.get('gate_vad')) if args.get('gate', True) else None
+        self.segmenter = vad.Segmenter(min_length=min_length, post_silence=post_silence, aggressiveness=2,
+                                       max_length=MAX_UTTERANCE)
+        self.transcribed_text = store.TranscriptBuffer(args.get('history') or store.DEFAULT_WINDOW)
+        model_name = args['model_name'].replace('/', '-')
+        self.log = log.Log(args, filename=f'speech-{stream_id}-{model_name}', test='')
+        self.utterances = queue.Queue()
+        # The reader writes, the transcriber reads utterance windows; positions match the segmenter's
+        self.ring = RingBuffer(RING_SECONDS * SAMPLE_RATE)
+        self.reader = threading.Thread(target=self.read, name=f"stream-{stream_id}", daemon=True)
+        self.transcriber = threading.Thread(target=self.transcribe, name=f"transcribe-{stream_id}", daemon=True)
+
+    def start(self):
+        self.reader.start()
+        self.transcriber.start()
+
+    def read(self):
+        try:
+            for chunk in self.source.chunks():
+                self.ring.write(chunk)
+                for start, end in self.segmenter.feed(chunk):
+                    self.utterances.put((max(start - PRE_ROLL, self.ring.oldest()), end))
+            for start, end in self.segmenter.flush():
+                self.utterances.put((max(start - PRE_ROLL, self.ring.oldest()), end))
+        except Exception as e:
+            print(f"Error reading stream {self.id}: {e}")
+        finally:
+            self.utterances.put(None)
+
+    def samples(self, start, end):
+        """Converts an utterance window of the ring to float32, the one copy on its way to the model."""
+        samples = np.empty(end - start, dtype=np.float32)
+        offset = 0
+        for view in self.ring.views(start, end):
+            samples[offset:offset + len(view)] = view
+            offset += len(view)
+        samples /= 32768
+        # The reader may have lapped the window while it was being copied
+        return samples if self.ring.valid(start) else None
+
+    def transcribe(self):
+        while True:
+            item = self.utterances.get()
+            if item is None:
+                return
+            start, end = item
+            try:
+                samples = self.samples(start, end)
+            except IndexError:
+                samples = None
+            self.ring.consumed = end
+            if samples is None:
+                print(f"Stream {self.id} fell more than {RING_SECONDS} s behind, dropped an utterance")
+                continue
+            if self.gate is not None and not self.gate.check(samples):
+                continue
+            try:
+                text, lang = self.model.transcribe(samples)
+            except Exception as e:
+                print(f"Error transcribing stream {self.id}: {e}")
+                continue
+            if not text:
+                continue
+            started = self.source.started or time.monotonic()
+            segment = Segment(text, started + start / SAMPLE_RATE, started + end / SAMPLE_RATE, lang=lang,
+                              source=self.id)
+            self.process_text(segment)
+
+    def process_text(self, segment):
+        print(f"[{self.id}] {segment.text}", flush=True)
+        self.transcribed_text.append(segment.text)
+        self.log.write_log(segment)
+
+    def join(self):
+        self.reader.join()
+        self.transcriber.join()
+
+    def stop(self):
+        self.source.close()
+
+    def close(self):
+        if self.gate is not None:
+            print(f"[{self.id}] {self.gate.summary()}")
+        self.log.close_log_file()
+        self.transcribed_text.close()
+
+
+def run(args):
+    """Captions every args['streams'] source at once with one shared model."""
+    specs = [parse_stream(spec, i + 1) for i, spec in enumerate(args['streams'])]
+    if args.get('backend') == 'stub':
+        shared = StubModel(args['lang'])
+    else:
+        import caption.batch as batch
+        shared = SharedModel(args['model_name'], batch.resolve_compute_type(args), args['lang'], len(specs))
+    max_batch = args.get('max_batch') or scheduler.DEFAULT_MAX_BATCH
+    batches = None
+    if max_batch > 1:
+        # Utterances that are ready together share one batched model call
+        max_wait = args.get('max_wait')
+        # --max-wait 0 sends each batch as soon as the model is free
+        batches = scheduler.BatchScheduler(shared.transcribe_batch, max_batch,
+                                           scheduler.DEFAULT_MAX_WAIT if max_wait is None else max_wait)
+    streams = [Stream(stream_id, create_source(source), batches or shared, args)
+               for stream_id, source in specs]
+    print(f"Captioning {len(streams)} streams: {', '.join(stream.id for stream in streams)}")
+    for stream in streams:
+        stream.start()
+    try:
+        for stream in streams:
+            stream.join()
+    except KeyboardInterrupt:
+        print("\nStopping streams...")
+        for stream in streams:
+            stream.stop()
+    finally:
+        for stream in streams:
+            stream.close()
+        if batches:
+            batches.close()
+            for size, stats in batches.stats().items():
+                print(f"Batch size {size}: {stats}")
+        shared.close()
+        registry.clear()
@@ -0,0 +1,76 @@
+import threading
+import time
+
+DEFAULT_RATE = 10.0
+
+
+class Coalescer:
+    """Delivers the latest of a stream of values at most `rate` times a second.
+
+    Partial hypotheses arrive far more often than anyone can read them. An
+    update is delivered at once if the last delivery is old enough; otherwise
+    it replaces whatever is waiting and a timer delivers it when the interval
+    is up, so the newest value always arrives and intermediate ones are dropped.
+    """
+
+    def __init__(self, callback, rate=DEFAULT_RATE):
+        """
+        Args:
+            callback (callable): Called with each delivered value, on the updating or timer thread.
+            rate (float): Maximum deliveries per second; 0 or less delivers every update.
+        """
+        self.callback = callback
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.pending = None
+        self.has_pending = False
+        self.last = 0.0
+        self.timer = None
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.delivered = 0
+        self.dropped = 0
+
+    def update(self, value):
+        with self.lock:
+            if self.has_pending:
+                self.dropped += 1
+            wait = self.last + self.interval - time.monotonic()
+            if wait > 0:
+                self.pending = value
+                self.has_pending = True
+                if self.timer is None:
+                    self.timer = threading.Timer(wait, self.fire, args=(self.generation,))
+                    self.timer.daemon = True
+                    self.timer.start()
+                return
+            self.pending = None
+            self.has_pending = False
+            self.last = time.monotonic()
+            self.delivered += 1
+        self.callback(value)
+
+    def fire(self, generation):
+        with self.lock:
+            self.timer = None
+            if generation != self.generation or not self.has_pending:
+                return
+            value = self.pending
+            self.pending = None
+            self.has_pending = False
+            self.last = time.monotonic()
+            self.delivered += 1
+        self.callback(value)
+
+    def reset(self):
+        """Drops the waiting value, e.g. once the final text has arrived."""
+        with self.lock:
+            self.generation += 1
+            self.pending = None
+            self.has_pending = False
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def stats(self):
+        with self.lock:
+            return {'delivered': self.delivered, 'dropped': self.dropped}
@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_BUDGET_MB = 4096
+
+# Rough resident size of a loaded model in MB, by model family, at float32
+MODEL_SIZE_MB = {
+    'tiny': 150,
+    'base': 300,
+    'small': 1000,
+    'medium': 2600,
+    'large': 4700,
+}
+
+
+def estimate_size_mb(model_name, compute_type='default'):
+    """Estimates the memory a loaded model takes, for the registry budget."""
+    name = model_name.lower().rsplit('/', 1)[-1]
+    size = 300
+    for family, family_size in MODEL_SIZE_MB.items():
+        if family in name:
+            size = family_size
+    if 'distil' in name:
+        size = size * 0.6
+    if compute_type and compute_type.startswith('int8'):
+        size = size / 3
+    elif compute_type in ('float16', 'bfloat16'):
+        size = size / 2
+    return size
+
+
+class Entry:
+    def __init__(self, key, value, size_mb, close):
+        self.key = key
+        self.value = value
+        self.size_mb = size_mb
+        self.close = close
+        self.in_use = True
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models with LRU eviction under a memory budget.
+
+    Values are acquired by key, e.g. (model, compute type, device). Released
+    values stay loaded until the total size exceeds the budget, at which point
+    the least recently used idle values are closed. Several values may share
+    a key when more than one is in use at the same time.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget_mb = budget_mb
+        self.entries = OrderedDict()  # id(value) -> Entry, least recently used first
+        self.lock = threading.RLock()
+
+    def acquire(self, key, load, size_mb=0, close=None):
+        """Returns an idle value for key, loading it with load() if there is none.
+
+        Returns:
+            tuple: (value, reused) where reused tells whether it was already loaded.
+        """
+        with self.lock:
+            for entry_id, entry in self.entries.items():
+                if entry.key == key and not entry.in_use:
+                    entry.in_use = True
+                    self.entries.move_to_end(entry_id)
+                    return entry.value, True
+
+        value = load()
+        with self.lock:
+            self.entries[id(value)] = Entry(key, value, size_mb, close)
+            self.evict()
+        return value, False
+
+    def release(self, value):
+        """Marks a value idle; it stays loaded while the budget allows."""
+        with self.lock:
+            entry = self.entries.get(id(value))
+            if entry is None:
+                return
+            entry.in_use = False
+            self.entries.move_to_end(id(value))
+            self.evict()
+
+    def discard(self, value):
+        """Removes a value from the registry and closes it."""
+        with self.lock:
+            entry = self.entries.pop(id(value), None)
+        if entry is not None:
+            self.close(entry)
+
+    def size_mb(self):
+        with self.lock:
+            return sum(entry.size_mb for entry in self.entries.values())
+
+    def evict(self):
+        """Closes least recently used idle values until the budget is met."""
+        with self.lock:
+            evicted = []
+            total = self.size_mb()
+            for entry_id, entry in list(self.entries.items()):
+                if total <= self.budget_mb:
+                    break
+                if not entry.in_use:
+                    del self.entries[entry_id]
+                    total -= entry.size_mb
+                    evicted.append(entry)
+        for entry in evicted:
+            self.close(entry)
+
+    def clear(self):
+        """Closes every value, in use or not."""
+        with self.lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+        for entry in entries:
+            self.close(entry)
+
+    @staticmethod
+    def close(entry):
+        if entry.close is None:
+            return
+        try:
+            entry.close(entry.value)
+        except Exception as e:
+            print(f"Error unloading model {entry.key}: {e}")
+
+
+registry = ModelRegistry()
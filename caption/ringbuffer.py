@@ -0,0 +1,100 @@
+import numpy as np
+
+
+def as_bytes(samples):
+    """Returns a byte memoryview of a contiguous sample array, usable wherever bytes are."""
+    return memoryview(samples).cast('B')
+
+
+class RingBuffer:
+    """Preallocated ring of 16-bit PCM samples for one producer and one consumer.
+
+    Positions are absolute sample counts since the buffer was created. The
+    producer only ever advances `written` (after the samples are in place)
+    and the consumer only `consumed`, so neither side takes a lock; single
+    integer stores are atomic under the GIL. Reads return NumPy views into
+    the ring, not copies. A view stays valid until the producer has written
+    `capacity` samples past its start; valid() tells whether that happened.
+    """
+
+    def __init__(self, capacity, dtype=np.int16):
+        """
+        Args:
+            capacity (int): Samples held before the oldest are overwritten.
+            dtype: Sample type.
+        """
+        self.data = np.zeros(capacity, dtype=dtype)
+        self.capacity = capacity
+        self.written = 0
+        self.consumed = 0
+        # Times the producer overwrote samples the consumer had not read
+        self.overruns = 0
+
+    def __len__(self):
+        """Samples written but not yet consumed (and not yet overwritten)."""
+        return min(self.written - self.consumed, self.capacity)
+
+    def write(self, pcm):
+        """Copies PCM (bytes, memoryview or array) into the ring. Producer side."""
+        samples = pcm if isinstance(pcm, np.ndarray) else np.frombuffer(pcm, dtype=self.data.dtype)
+        count = len(samples)
+        if count > self.capacity:
+            # Only the newest capacity samples can be kept
+            self.written += count - self.capacity
+            samples = samples[-self.capacity:]
+            count = self.capacity
+        start = self.written % self.capacity
+        first = min(count, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:count - first] = samples[first:]
+        if self.written + count - self.consumed > self.capacity:
+            self.overruns += 1
+        self.written += count
+        return count
+
+    def write_from(self, readinto, max_samples):
+        """Lets readinto() (e.g. a file's) fill the ring directly, without an intermediate bytes object.
+
+        Returns the number of samples written; 0 at end of stream. At most
+        max_samples are read, fewer where the ring wraps.
+        """
+        start = self.written % self.capacity
+        count = min(max_samples, self.capacity - start)
+        itemsize = self.data.itemsize
+        got = readinto(as_bytes(self.data[start:start + count])) or 0
+        samples = got // itemsize
+        if self.written + samples - self.consumed > self.capacity:
+            self.overruns += 1
+        self.written += samples
+        return samples
+
+    def oldest(self):
+        """Position of the oldest sample still in the ring."""
+        return max(0, self.written - self.capacity)
+
+    def valid(self, start):
+        """Whether the samples from position start on have not been overwritten."""
+        return start >= self.oldest()
+
+    def views(self, start, stop):
+        """Returns the samples start <= i < stop as one view, or two where the ring wraps."""
+        if not self.valid(start) or stop > self.written or start > stop:
+            raise IndexError(f"samples {start}-{stop} are not in the ring ({self.oldest()}-{self.written})")
+        begin = start % self.capacity
+        end = begin + stop - start
+        if end <= self.capacity:
+            return [self.data[begin:end]]
+        return [self.data[begin:], self.data[:end - self.capacity]]
+
+    def window(self, start, stop):
+        """Returns the samples start <= i < stop as one array; a view unless the ring wraps there."""
+        views = self.views(start, stop)
+        return views[0] if len(views) == 1 else np.concatenate(views)
+
+    def read(self, max_samples=None):
+        """Consumes up to max_samples unread samples and returns their views. Consumer side."""
+        start = max(self.consumed, self.oldest())
+        stop = self.written if max_samples is None else min(self.written, start + max_samples)
+        views = self.views(start, stop)
+        self.consumed = stop
+        return views
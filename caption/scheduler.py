@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+DEFAULT_MAX_BATCH = 8
+DEFAULT_MAX_WAIT = 0.05
+
+
+def batched_transcriber(model, lang=None, beam_size=5):
+    """Returns a function transcribing a list of utterances in one batched model call.
+
+    The utterances are laid end to end and passed to faster-whisper's
+    BatchedInferencePipeline as clip_timestamps, so each one is decoded as
+    its own item of the batch. Segments are mapped back to utterances by
+    their midpoint.
+
+    Since faster-whisper 1.2 clip_timestamps are in seconds (1.1 took sample
+    positions), so the integer sample offsets are converted to seconds here.
+    """
+    from faster_whisper import BatchedInferencePipeline
+    pipeline = BatchedInferencePipeline(model=model)
+
+    def transcribe_batch(utterances):
+        starts = []
+        clips = []
+        position = 0
+        for samples in utterances:
+            starts.append(position / SAMPLE_RATE)
+            clips.append({'start': position / SAMPLE_RATE, 'end': (position + len(samples)) / SAMPLE_RATE})
+            position += len(samples)
+        audio = np.concatenate(utterances).astype(np.float32)
+        segments, info = pipeline.transcribe(audio, language=lang, beam_size=beam_size, vad_filter=False,
+                                             clip_timestamps=clips, batch_size=len(utterances))
+        texts = [[] for _ in utterances]
+        for segment in segments:
+            index = max(0, bisect_right(starts, (segment.start + segment.end) / 2) - 1)
+            texts[index].append(segment.text.strip())
+        return [(' '.join(parts), info.language) for parts in texts]
+
+    return transcribe_batch
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class BatchStats:
+    """Throughput and latency of the batches of one size."""
+
+    def __init__(self):
+        self.batches = 0
+        self.utterances = 0
+        self.audio_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.latencies = deque(maxlen=1000)
+
+    def to_dict(self):
+        return {
+            'batches': self.batches,
+            'utterances': self.utterances,
+            'audio_seconds': self.audio_seconds,
+            'compute_seconds': self.compute_seconds,
+            'utterances_per_second': self.utterances / self.compute_seconds if self.compute_seconds else None,
+            'rtf': self.compute_seconds / self.audio_seconds if self.audio_seconds else None,
+            'latency_p50': percentile(self.latencies, 0.5),
+            'latency_p90': percentile(self.latencies, 0.9),
+        }
+
+
+class BatchScheduler:
+    """Collects ready utterances into batches for one model call each.
+
+    A batch is run as soon as max_batch utterances are waiting, or max_wait
+    seconds after the first of them arrived, whichever comes first. An
+    idle model therefore adds at most max_wait to a lone utterance, while a
+    backlog is cleared max_batch utterances at a time.
+    """
+
+    def __init__(self, transcribe_batch, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT):
+        """
+        Args:
+            transcribe_batch (callable): Takes a list of float32 sample arrays and
+                returns one (text, language) pair per array.
+            max_batch (int): Most utterances per model call.
+            max_wait (float): Longest (seconds) the first utterance of a batch waits for company.
+        """
+        self.transcribe_batch = transcribe_batch
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self.pending = queue.Queue()
+        self.stats_by_size = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name='batch-scheduler', daemon=True)
+        self.thread.start()
+
+    def submit(self, samples):
+        """Queues an utterance; the returned Future resolves to (text, language)."""
+        future = Future()
+        self.pending.put((samples, future, time.monotonic()))
+        return future
+
+    def transcribe(self, samples):
+        """Blocking form of submit(), with the same signature as a single-utterance model."""
+        return self.submit(samples).result()
+
+    def collect(self):
+        first = self.pending.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                # Utterances already waiting join without delay
+                item = self.pending.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is None:
+                self.pending.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.collect()
+            if batch is None:
+                return
+            started = time.monotonic()
+            try:
+                results = self.transcribe_batch([samples for samples, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.monotonic()
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+            self.record(batch, finished - started, finished)
+
+    def record(self, batch, compute_seconds, finished):
+        with self.lock:
+            stats = self.stats_by_size.setdefault(len(batch), BatchStats())
+            stats.batches += 1
+            stats.utterances += len(batch)
+            stats.audio_seconds += sum(len(samples) for samples, _, _ in batch) / SAMPLE_RATE
+            stats.compute_seconds += compute_seconds
+            stats.latencies.extend(finished - submitted for _, _, submitted in batch)
+
+    def stats(self):
+        """Metrics per batch size: throughput, real-time factor and submit-to-result latency."""
+        with self.lock:
+            return {size: stats.to_dict() for size, stats in sorted(self.stats_by_size.items())}
+
+    def close(self):
+        """Finishes the utterances already submitted, then stops."""
+        self.pending.put(None)
+        self.thread.join()
@@ -0,0 +1,108 @@
+import time
+
+# Offset from the monotonic clock to wall-clock time, fixed once at startup
+WALL_OFFSET = time.time() - time.monotonic()
+
+
+class Word:
+    """A recognized word with its monotonic start and end time."""
+
+    __slots__ = ('text', 'start', 'end', 'probability')
+
+    def __init__(self, text, start, end, probability=None):
+        self.text = text
+        self.start = start
+        self.end = end
+        self.probability = probability
+
+    def to_dict(self):
+        return {'text': self.text, 'start': self.start, 'end': self.end, 'probability': self.probability}
+
+
+class Segment:
+    """One recognized utterance as it flows from the recognizer to the GUI, web and log.
+
+    Times are time.monotonic() values of the audio, so latency is simply
+    time.monotonic() - segment.end; wall_time() converts them for display.
+    """
+
+    __slots__ = ('text', 'start', 'end', 'words', 'confidence', 'lang', 'model', 'source', 'revision', 'partial',
+                 'sequence')
+
+    def __init__(self, text, start=None, end=None, words=(), confidence=None, lang=None, model=None,
+                 source=None, revision=0, partial=False):
+        """
+        Args:
+            text (str): Recognized text.
+            start (float, optional): Monotonic time the speech started.
+            end (float, optional): Monotonic time the speech ended.
+            words (tuple): Word timings, if the recognizer provides them; the
+                RealtimeSTT recognizer does not.
+            confidence (float, optional): Recognizer confidence from 0 to 1, if provided.
+            lang (str, optional): Language of the text.
+            model (str, optional): Model that produced the text.
+            source (str, optional): Audio source name.
+            revision (int): 0 for a new line, higher when it replaces an earlier hypothesis.
+            partial (bool): True for a hypothesis of an utterance still in progress.
+
+        sequence is set by Speech: the number of a final line, or for a partial
+        the number of final lines before it, so a partial that arrives after
+        its own final line can be told apart.
+        """
+        self.text = text
+        self.start = start
+        self.end = end
+        self.words = tuple(words)
+        self.confidence = confidence
+        self.lang = lang
+        self.model = model
+        self.source = source
+        self.revision = revision
+        self.partial = partial
+        self.sequence = 0
+
+    @classmethod
+    def of(cls, value):
+        """Returns value as a Segment, wrapping plain strings."""
+        if isinstance(value, cls):
+            return value
+        now = time.monotonic()
+        return cls(str(value), now, now)
+
+    @property
+    def duration(self):
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
+    def wall_time(self):
+        """Wall-clock time (seconds since the epoch) the speech ended."""
+        moment = self.end if self.end is not None else self.start
+        if moment is None:
+            return time.time()
+        return WALL_OFFSET + moment
+
+    def to_dict(self):
+        """The segment as JSON-ready values; words and confidence only when the recognizer gave them."""
+        result = {
+            'text': self.text,
+            'start': self.start,
+            'end': self.end,
+            'time': self.wall_time(),
+            'lang': self.lang,
+            'model': self.model,
+            'source': self.source,
+            'revision': self.revision,
+            'partial': self.partial,
+        }
+        if self.words:
+            result['words'] = [word.to_dict() for word in self.words]
+        if self.confidence is not None:
+            result['confidence'] = self.confidence
+        return result
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"Segment({self.text!r}, start={self.start}, end={self.end}, model={self.model!r})"
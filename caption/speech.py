@@ -1,18 +1,27 @@
 import os
 import sys
-cpu_threads = os.cpu_count()
-os.environ["OMP_NUM_THREADS"] = str(cpu_threads)
-os.environ["MKL_NUM_THREADS"] = str(cpu_threads)
-os.environ["NUMEXPR_NUM_THREADS"] = str(cpu_threads)
-os.environ["OMP_WAIT_POLICY"] = "ACTIVE"  # Better performance
-from RealtimeSTT import AudioToTextRecorder
-from pynput import keyboard
+import caption.cpu as cpu
+# Must run before the numerical libraries are imported
+cpu.configure_environment(cpu.make_plan())
 import threading
+import time
 import signal
-import caption.web as web
-import caption.gui as gui
-import caption.input as input
+# caption.gui (PyQt5), caption.web (Flask) and caption.input (pynput) are
+# imported in start() only when requested, so CLI runs do not pay for them
 import caption.log as log
+import caption.backend as backend
+import caption.calibration as calibration
+import caption.store as store
+import caption.partial as partial
+import caption.bus as bus
+import caption.gate as gate
+import caption.dedup as dedup
+import caption.profiler as profiler
+from caption.registry import registry
+from caption.segment import Segment
+from caption.startup import timer
+from caption.metrics import metrics
+import model
 import logging
 import atexit
 
@@ -24,14 +33,41 @@ if DEBUG:
     logging.basicConfig(level=logging.DEBUG)
 class Speech:
     def __init__(self, args):
-        self.transcribed_text = []
+        self.transcribed_text = store.TranscriptBuffer(args.get('history') or store.DEFAULT_WINDOW)
         self.quit_program = False
         self.ui = None
+        self.web = None
         self.args = args
         self.stop = False
         self.recorder = None
+        self.source = None  # audio source override, defaults to args['source']
         self.recording_scale = 1.25
+        self.min_gap_between_recordings = 0.4
+        self.post_speech_silence_duration = 0.16
         self.recording_enabled = True
+        # Final lines so far, and where the last one started, to spot stale partials
+        self.line_sequence = 0
+        self.last_line_start = None
+        self.calibration = None
+        # Settings changes: the latest one wins, and recognizers are built one at a time
+        self.switch_lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.switch_generation = 0
+        self.handover_pending = False
+        self.compute_type = args.get('compute_type') or 'default'
+        self.cpu_plan = cpu.make_plan(args)
+        cpu.configure_environment(self.cpu_plan)
+        registry.budget_mb = args.get('model_cache_mb') or registry.budget_mb
+        # Skips silent and noise-only segments before they reach the model
+        self.gate = gate.Gate(aggressiveness=args.get('gate_vad')) if args.get('gate', True) else None
+        # Transcript events go out to the GUI, web and log through their own queues
+        self.bus = bus.EventBus()
+        metrics.watch(self)
+        # Live line updates from the realtime model, at most partial_rate a second
+        self.partials = partial.Coalescer(self.show_partial, args.get('partial_rate', partial.DEFAULT_RATE))
+        # Switched on and off at runtime; writes next to the session log
+        self.logger = None
+        self.profiler = profiler.Profiler(self.profile_directory)
         # Register cleanup handler
         atexit.register(self.cleanup)
 
@@ -40,6 +76,11 @@ class Speech:
         if self.ui:
             self.ui.updateRecordingStatus(self.recording_enabled)
 
+    def profile_directory(self):
+        if self.logger and self.logger.directory:
+            return self.logger.directory
+        return os.getcwd()
+
     def cleanup(self):
         """Clean up resources on exit"""
         self.stop = True
@@ -56,101 +97,247 @@ class Speech:
             finally:
                 # Ensure recorder is set to None after stopping
                 self.recorder = None
+        self.bus.close()
+        metrics.unwatch(self)
+        # Unload every model kept warm for settings changes
+        registry.clear()
+        self.transcribed_text.close()
+
+    def export_transcript(self, path):
+        """Writes every line of the session, including spilled history, to path."""
+        self.transcribed_text.export(path)
 
-    def process_text(self, text):
+    def process_text(self, segment):
         if not self.recording_enabled:
             return
-        print(text, end=" ", flush=True)
-        self.transcribed_text.append(text)
-        if self.ui:
-            try:
-                self.ui.newLineSignal.emit(text)
-            except Exception as e:
-                print(f"Error adding new line to UI: {e}")
+        timer.mark('first_caption')
+        if isinstance(segment, Segment) and segment.end is not None:
+            metrics.recognition_latency.observe(time.monotonic() - segment.end)
+        metrics.lines.inc(state='published')
+        segment = Segment.of(segment)
+        self.line_sequence += 1
+        segment.sequence = self.line_sequence
+        self.last_line_start = segment.start
+        # The final text replaces the live line, so a waiting partial is stale
+        self.partials.reset()
+        print(segment.text, end=" ", flush=True)
+        self.transcribed_text.append(segment.text)
+        self.bus.publish('line', segment)
+
+    def audio_backlog(self):
+        """Seconds of captured audio the current recognizer has not processed yet, or None if unknown."""
+        recorder = self.recorder
+        return recorder.backlog_seconds() if recorder is not None else None
+
+    def process_partial(self, segment):
+        """Takes a partial hypothesis of the utterance in progress."""
+        if not self.recording_enabled or not segment.text:
+            return
+        if None not in (segment.start, self.last_line_start) and segment.start <= self.last_line_start:
+            # A late hypothesis of an utterance whose final line is already out
+            return
+        segment.sequence = self.line_sequence
+        self.partials.update(segment)
+
+    def show_partial(self, segment):
+        self.bus.publish('partial', segment)
+
+    def attach_ui(self, ui):
+        """Shows transcript events in the caption window."""
+        self.ui = ui
+        # The GUI connects its signals with BlockingQueuedConnection, so each
+        # emit waits until the GUI thread has shown the event. A stalled GUI
+        # backs up this queue, where the oldest events are dropped, and never
+        # makes publish() wait.
+        self.bus.subscribe('gui', self.deliver_to_ui, maxsize=200, policy=bus.DROP_OLDEST,
+                           kinds=('line', 'partial'))
+
+    def deliver_to_ui(self, event):
+        if event.kind == 'line':
+            self.ui.newLineSignal.emit(event.segment)
+        else:
+            self.ui.partialLineSignal.emit(event.segment)
+
+    def attach_web(self, web_app):
+        """Serves transcript events over HTTP; clients poll, so old events may be dropped."""
+        self.web = web_app
+        web_app.profiler = self.profiler
+        self.bus.subscribe('web', web_app.handle_event, maxsize=100, policy=bus.DROP_OLDEST)
+
+    def attach_log(self, logger):
+        """Writes final lines and clears to the session log, off the GUI thread.
+
+        Scrollback pages through the indexed log entries, so only the lines the
+        caption window shows are indexed: clears and lines its duplicate check
+        drops are written but not indexed.
+        """
+        duplicates = dedup.DuplicateDetector()
+
+        def write(event):
+            if event.kind == 'clear':
+                duplicates.clear()
+                logger.write_log('-- Clear --', indexed=False)
+                return
+            text = str(event.segment)
+            shown = not duplicates.is_duplicate(text)
+            if shown:
+                duplicates.add(text)
+            logger.write_log(event.segment, indexed=shown)
+        # Lines are only lost if the disk stalls for a thousand of them; recognition never waits
+        return self.bus.subscribe('log', write, maxsize=1000, policy=bus.DROP_OLDEST,
+                                  kinds=('line', 'clear'))
+
+    def resolve_compute_type(self):
+        """Resolves args['compute_type'], benchmarking the candidates for 'auto'."""
+        compute_type = self.args.get('compute_type') or 'default'
+        if compute_type == 'auto':
+            if self.args.get('backend') == 'stub':
+                compute_type = 'default'
+            else:
+                compute_type = calibration.select_compute_type(
+                    self.args['model_name'], self.args['lang'], self.args.get('calibration_clip'),
+                    force=self.args.get('calibrate') is True)
+        self.compute_type = compute_type
+
+    def calibrate(self):
+        """Loads this host's timing for the current model, measuring it on first use."""
+        try:
+            self.resolve_compute_type()
+        except Exception as e:
+            print(f"Compute type selection failed, using default: {e}")
+            self.compute_type = 'default'
+        self.calibration = None
+        if self.args.get('calibrate') is False or self.args.get('backend') == 'stub':
+            return
+        force = self.args.get('calibrate') is True
+        try:
+            self.calibration = calibration.calibrate(self.args['model_name'], self.compute_type,
+                                                     lang=self.args['lang'], force=force)
+        except Exception as e:
+            print(f"Calibration failed, using default timing: {e}")
+        if force:
+            # Only the first model is re-measured; later switches use the cache
+            self.args['calibrate'] = None
 
     def get_min_length_of_recording(self):
-        conditionsHigh = {
-            ('en', 'tiny.en'): 1.5,
-            ('en', 'tiny'): 1.75,
-            ('en', 'base.en'): 2.2,
-            ('en', 'base'): 2.25,
-            ('en', 'small.en'): 3.8,
-            ('en', 'small'): 3.85,
-            ('en', 'medium.en'): 7.8,
-            ('en', 'medium'): 7.85,
-            ('en', 'large'): 12.5,
-            ('en', 'large-v2'): 19,
-            ('en', 'large-v3'): 48,
-            ('', 'tiny'): 2,
-            ('', 'base'): 3,
-            ('', 'small'): 5,
-            ('', 'medium'): 10,
-            ('', 'large'): 20,
-            ('', 'large-v2'): 30,
-            ('', 'large-v3'): 50,
-        }
-        conditions = {
-            ('en', 'tiny.en'): 1.5,
-            ('en', 'tiny'): 1.75,
-            ('en', 'base.en'): 2,
-            ('en', 'base'): 2.25,
-            ('en', 'small.en'): 2.8,
-            ('en', 'small'): 2.85,
-            ('en', 'medium.en'): 3.8,
-            ('en', 'medium'): 3.85,
-            ('en', 'large'): 4.5,
-            ('en', 'large-v2'): 5,
-            ('en', 'large-v3'): 8,
-            ('', 'tiny'): 2,
-            ('', 'base'): 3,
-            ('', 'small'): 4,
-            ('', 'medium'): 5,
-            ('', 'large'): 7,
-            ('', 'large-v2'): 9,
-            ('', 'large-v3'): 12,
-        }
-
-        lang = 'en' if not self.args['lang'] is None and 'en' in self.args['lang'] else ''
-
-        return conditions.get((lang, self.args['model_name']), 1) * self.recording_scale
-    
+        """Minimum utterance length in seconds passed to the recorder."""
+        if self.calibration:
+            return self.calibration['min_length_of_recording'] * self.recording_scale
+        return model.min_length_of_recording(self.args['model_name'], self.args['lang']) * self.recording_scale / 3
+
+    def recorder_kwargs(self):
+        """Returns the AudioToTextRecorder settings for the current args."""
+        kwargs = dict(
+            spinner=True,
+            model=self.args['model_name'],
+            device='cpu',
+            compute_type=self.compute_type,
+            language=self.args['lang'],
+            enable_realtime_transcription=self.args['realtime'],
+            realtime_model_type=self.args['realtime_model'],
+            #level=logging.DEBUG,
+            debug_mode=True,
+            webrtc_sensitivity=0,
+            min_length_of_recording=self.get_min_length_of_recording(),
+            silero_sensitivity=0.1,
+            min_gap_between_recordings=self.min_gap_between_recordings,
+            post_speech_silence_duration=self.post_speech_silence_duration / self.recording_scale
+        )
+        if self.calibration and self.args['realtime_model'] == self.args['model_name']:
+            kwargs['realtime_processing_pause'] = self.calibration['realtime_processing_pause']
+        return kwargs
+
+    def switch(self, model_name, language, time_scale):
+        """Applies new model, language and timing settings without a gap in captions.
+
+        The current recognizer keeps captioning while the new one is built in
+        the background. Audio heard since its last utterance is replayed into
+        the new one, and main_program picks the new one up for the next line.
+        When settings change again before the new one is ready, only the
+        latest change is applied; a recognizer built for an earlier one is
+        stopped and its model handed back to the registry.
+        """
+        with self.switch_lock:
+            self.switch_generation += 1
+            generation = self.switch_generation
+            old = self.recorder
+            self.args['model_name'] = model_name
+            self.args['lang'] = language
+            self.recording_scale = time_scale
+            if old is None:
+                # main_program is still starting and will read the new args
+                return
+
+            if getattr(old, 'key', None) == backend.recorder_key(self.recorder_kwargs()):
+                # Same model: language and timing change on the loaded recorder,
+                # and a build still running for an earlier change is dropped
+                if self.handover_pending:
+                    old.cancel_handover()
+                    self.handover_pending = False
+                old.apply_settings(self.recorder_kwargs())
+                return
+
+            if not self.handover_pending:
+                old.begin_handover()
+                self.handover_pending = True
+
+        def superseded():
+            return generation != self.switch_generation
+
+        def build():
+            with self.build_lock:
+                if superseded():
+                    return
+                try:
+                    self.calibrate()
+                    new = backend.create_recognizer(self, old.source, listen=False)
+                except Exception as e:
+                    print(f"Error switching recognizer: {e}")
+                    with self.switch_lock:
+                        if not superseded():
+                            old.cancel_handover()
+                            self.handover_pending = False
+                    return
+                with self.switch_lock:
+                    if self.stop or superseded():
+                        new.stop(close_source=False)
+                        return
+                    old.hand_over(new)
+                    self.recorder = new
+                    self.handover_pending = False
+                old.stop(close_source=False)
+
+        threading.Thread(target=build, daemon=True).start()
+
     def main_program(self):
+        recorder = None
         try:
             import time
+            with timer.phase('calibration'):
+                self.calibrate()
             print("Initializing audio recorder...")
-            # Initialize the recorder with current settings
-            recorder = AudioToTextRecorder(
-                spinner=True,
-                model=self.args['model_name'],
-                device='cpu',
-                language=self.args['lang'],
-                enable_realtime_transcription=self.args['realtime'],
-#                use_microphone=self.args['use_microphone'],
-#                model_path=None,
-                realtime_model_type=self.args['realtime_model'],
-                #level=logging.DEBUG,
-                debug_mode=True,
-                webrtc_sensitivity=0,
-                min_length_of_recording=self.get_min_length_of_recording() / 3,
-                silero_sensitivity=0.1,
-                min_gap_between_recordings=0.4,
-                post_speech_silence_duration = 0.16 / self.recording_scale
-            )
-
-            # Store the recorder in the instance
+            # Initialize the recognizer with current settings; this loads the models
+            with timer.phase('recorder'):
+                recorder = backend.create_recognizer(self, self.source)
+
+            # Store the recognizer in the instance
             self.recorder = recorder
 
             print("Audio recorder initialized. Starting transcription. Say something...")
 
             print("> ", end="", flush=True)
             while not self.stop:
+                # A settings change may have switched to a new recognizer
+                if self.recorder is not None:
+                    recorder = self.recorder
+                if recorder.finished:
+                    break
                 try:
-                    # Process text from the recorder
-                    # The RealtimeSTT library's text() method blocks until a full sentence/phrase is detected
+                    # Process text from the recognizer
+                    # text() blocks until a full sentence/phrase is detected
                     # Check stop flag before each blocking call
                     if self.stop:
                         break
-                    # Use a timeout pattern if possible, though RealtimeSTT may not support this directly
                     recorder.text(self.process_text)
                 except Exception as e:
                     if self.stop:
@@ -170,32 +357,66 @@ class Speech:
             print(f"Error in transcription: {e}")
             print("This may be due to missing audio devices. Ensure audio is properly configured.")
         finally:
-            # Clean up the recorder
-            if self.recorder:
+            # Clean up the recognizer; a settings change may already have replaced it
+            if recorder:
                 try:
-                    self.recorder.stop()
+                    recorder.stop()
                     print("Audio recorder stopped")
                 except:
                     pass
-                self.recorder = None
+                if self.recorder is recorder:
+                    self.recorder = None
+            if self.gate and self.gate.checked:
+                print(self.gate.summary())
 
     def start(self):
-        control = input.Input(self.args)
+        control = None
+        if self.args.get('gui', False):
+            # pynput is only imported here, so its load time is a phase of its own
+            with timer.phase('input_import'):
+                import caption.input as input
+            # Global hotkeys drive the caption window, so headless runs go without
+            control = input.Input(self.args)
         logger = log.Log(self.args)
+        self.logger = logger
+        if self.args.get('profile', False):
+            self.profiler.start()
+        # GUI runs on this thread; the log and web threads started from here inherit its CPUs
+        cpu.pin_current_thread(self.cpu_plan.ui_cpus)
+        log_subscription = self.attach_log(logger)
+        # The startup profile goes next to the session log once the UI has shown a caption
+        timer.path = os.path.splitext(logger.file_path)[0] + '_startup.json'
+        timer.expected = {'first_caption', 'gui_first_paint'} if self.args.get('gui') else {'first_caption'}
 
         transcription_thread = threading.Thread(target=self.main_program)
         transcription_thread.start()
 
         try:
+            if self.args.get('web', False):
+                with timer.phase('web_import'):
+                    import caption.web as web
+                self.attach_web(web.Web(self.args))
             if self.args.get('gui', False):
-                self.ui = gui.initialize()
-                self.ui.language = self.args['lang']
-                self.ui.speech = self
-                self.ui.log = logger
-                control.gui = self.ui
-                self.ui.run()
-            elif self.args.get('web', False):
-                web.Web(self.args).start_server()
+                with timer.phase('gui_import'):
+                    import caption.gui as gui
+                if self.web:
+                    # The GUI owns this thread, so the web server runs beside it
+                    threading.Thread(target=self.web.start_server, kwargs={'background': True},
+                                     daemon=True).start()
+                ui = gui.initialize()
+                ui.language = self.args['lang']
+                ui.set_line_limit(self.args.get('max_lines') or 0)
+                ui.speech = self
+                ui.log = logger
+                control.gui = ui
+                self.attach_ui(ui)
+                ui.run()
+            elif self.web:
+                self.web.start_server()
+            else:
+                # CLI only: captions go to stdout until the source ends or Ctrl+C
+                while transcription_thread.is_alive():
+                    transcription_thread.join(timeout=0.5)
 
             # Wait for transcription to complete with a timeout to avoid hanging on exit
             transcription_thread.join(timeout=2.0)  # Wait up to 2 seconds for clean exit
@@ -205,5 +426,10 @@ class Speech:
             print(f"Error in main program: {e}")
         finally:
             self.stop = True
+            if not timer.written:
+                timer.write()
+            self.profiler.stop()
+            # Let the log catch up before closing it
+            log_subscription.close()
             if logger.file:
                 logger.close_log_file()
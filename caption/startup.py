@@ -0,0 +1,103 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def max_rss_mb():
+    """Peak resident set size of this process so far, in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class PhaseTimer:
+    """Wall time and peak RSS of each startup phase, for --profile-startup.
+
+    Phases are either spans (phase()) or milestones (mark()); each name is
+    recorded once, so calls on every caption cost a set lookup. Times are
+    seconds since `origin`, the start of captioner.py.
+    """
+
+    def __init__(self, origin=None):
+        self.enabled = False
+        self.origin = origin if origin is not None else time.monotonic()
+        self.records = []
+        self.seen = set()
+        self.expected = set()
+        self.path = None
+        self.written = False
+        self.lock = threading.Lock()
+
+    def enable(self, origin=None):
+        self.enabled = True
+        if origin is not None:
+            self.origin = origin
+
+    def record(self, name, start, end):
+        with self.lock:
+            if name in self.seen:
+                return
+            self.seen.add(name)
+            self.records.append({
+                'phase': name,
+                'start': start - self.origin,
+                'end': end - self.origin,
+                'duration': end - start,
+                'max_rss_mb': max_rss_mb(),
+            })
+            done = self.expected and self.expected <= self.seen
+        if done:
+            self.write()
+
+    @contextmanager
+    def phase(self, name):
+        """Times the enclosed block as one phase."""
+        if not self.enabled or name in self.seen:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.monotonic())
+
+    def mark(self, name):
+        """Records a milestone, such as the first caption, the first time it happens."""
+        if self.enabled and name not in self.seen:
+            now = time.monotonic()
+            self.record(name, now, now)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'phases': sorted(self.records, key=lambda record: record['end']),
+                'pending': sorted(self.expected - self.seen),
+                'total': max((record['end'] for record in self.records), default=0.0),
+            }
+
+    def write(self, path=None):
+        """Writes the report as JSON, to path or to the path set next to the session log."""
+        path = path or self.path
+        if not self.enabled or not path:
+            return
+        try:
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(self.to_dict(), file, indent=2)
+            if not self.written:
+                print(f"\nStartup profile written to {path}")
+            self.written = True
+        except OSError as e:
+            print(f"Could not write startup profile: {e}")
+
+
+timer = PhaseTimer()
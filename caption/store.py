@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+import threading
+from array import array
+from collections import deque
+
+DEFAULT_WINDOW = 200
+
+
+class SegmentStore:
+    """Append-only on-disk store of transcript lines with an offset index.
+
+    Each record is one JSON-encoded line, so any text (including newlines)
+    round-trips. Only the 8-byte offset of every record stays in memory.
+    """
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str, optional): Store file. A temporary file, deleted on close, when omitted.
+        """
+        self.temporary = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='captioner-', suffix='.segments')
+            os.close(fd)
+        self.path = path
+        self.file = open(path, 'a+b')
+        self.offsets = array('Q')
+        self.end = self.file.seek(0, os.SEEK_END)
+        self.lock = threading.Lock()
+
+    def append(self, text):
+        """Appends a record and returns its index."""
+        record = (json.dumps(text, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            self.file.write(record)
+            self.file.flush()
+            self.offsets.append(self.end)
+            self.end += len(record)
+            return len(self.offsets) - 1
+
+    def read(self, start, stop):
+        """Returns the records with index start <= i < stop."""
+        with self.lock:
+            stop = min(stop, len(self.offsets))
+            if start >= stop:
+                return []
+            begin = self.offsets[start]
+            finish = self.offsets[stop] if stop < len(self.offsets) else self.end
+            self.file.seek(begin)
+            data = self.file.read(finish - begin)
+        return [json.loads(line) for line in data.decode('utf-8').split('\n')[:-1]]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('segment index out of range')
+        return self.read(index, index + 1)[0]
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+        if self.temporary:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class TranscriptBuffer:
+    """Transcript lines with the recent window in memory and the full history on disk.
+
+    Lines are written through to a SegmentStore as they arrive, so memory
+    stays flat however long the session runs. Indexing and slicing work over
+    the whole history like a list; `recent` is the in-memory window.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, store=None):
+        self.recent = deque(maxlen=window)
+        self.store = store if store is not None else SegmentStore()
+        self.lock = threading.RLock()
+
+    def append(self, text):
+        with self.lock:
+            self.store.append(text)
+            self.recent.append(text)
+
+    def set_window(self, window):
+        """Changes how many recent lines are kept in memory."""
+        with self.lock:
+            if self.recent.maxlen != window:
+                self.recent = deque(self.recent, maxlen=window)
+
+    def clear(self):
+        """Empties the window; the history stays available from the store."""
+        with self.lock:
+            self.recent.clear()
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self.read(start, stop)
+            return [self[i] for i in range(start, stop, step)]
+        with self.lock:
+            if index < 0:
+                index += len(self)
+            first = len(self) - len(self.recent)
+            if first <= index < len(self):
+                return self.recent[index - first]
+        return self.store[index]
+
+    def read(self, start, stop):
+        """Returns history lines start <= i < stop, from memory when possible."""
+        with self.lock:
+            first = len(self) - len(self.recent)
+            if start >= first:
+                return list(self.recent)[start - first:stop - first]
+        return self.store.read(start, stop)
+
+    def __iter__(self):
+        for start in range(0, len(self), DEFAULT_WINDOW):
+            yield from self.read(start, start + DEFAULT_WINDOW)
+
+    def export(self, path):
+        """Writes the whole history to a text file, one line per segment."""
+        with open(path, 'w', encoding='utf-8') as file:
+            for line in self:
+                file.write(f"{line}\n")
+
+    def close(self):
+        self.store.close()
@@ -0,0 +1,153 @@
+from bisect import bisect_right
+
+import numpy as np
+
+from caption.ringbuffer import RingBuffer, as_bytes
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+# Frames of not yet analysed audio a Segmenter can hold
+BUFFER_FRAMES = 100
+
+
+def to_pcm16(samples):
+    """Converts float samples in [-1, 1] to 16-bit PCM bytes."""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+
+def speech_flags(samples, aggressiveness=2):
+    """Returns one speech/non-speech flag per 30 ms frame using webrtcvad."""
+    import webrtcvad
+    vad = webrtcvad.Vad(aggressiveness)
+    pcm = to_pcm16(samples)
+    frame_bytes = FRAME_SAMPLES * 2
+    count = len(pcm) // frame_bytes
+    return [vad.is_speech(pcm[i * frame_bytes:(i + 1) * frame_bytes], SAMPLE_RATE) for i in range(count)]
+
+
+def silence_midpoints(flags, min_silence_frames):
+    """Yields the middle frame of every silent run of at least min_silence_frames."""
+    run_start = None
+    for i, is_speech in enumerate(flags + [True]):
+        if not is_speech:
+            if run_start is None:
+                run_start = i
+        elif run_start is not None:
+            if i - run_start >= min_silence_frames:
+                yield (run_start + i) // 2
+            run_start = None
+
+
+def split_on_silence(samples, target_length=30.0, min_length=1.0, min_silence=0.3, aggressiveness=2):
+    """Splits audio into (start, end) sample ranges cut in the middle of pauses.
+
+    Args:
+        samples (np.ndarray): Mono float32 audio at SAMPLE_RATE.
+        target_length (float): Preferred chunk length in seconds.
+        min_length (float): Chunks shorter than this are merged into a neighbour.
+        min_silence (float): Shortest pause, in seconds, that may be used as a cut.
+        aggressiveness (int): webrtcvad aggressiveness, 0-3.
+    """
+    total = len(samples)
+    flags = speech_flags(samples, aggressiveness)
+    cuts = [frame * FRAME_SAMPLES for frame in
+            silence_midpoints(flags, max(1, int(min_silence * 1000 / FRAME_MS)))]
+
+    target = int(target_length * SAMPLE_RATE)
+    minimum = max(1, int(min_length * SAMPLE_RATE))
+    ranges = []
+    start = 0
+    while total - start > target:
+        # last pause before the target length, else the first one after it
+        i = bisect_right(cuts, start + target)
+        if i > 0 and cuts[i - 1] >= start + minimum:
+            end = cuts[i - 1]
+        elif i < len(cuts):
+            end = cuts[i]
+        else:
+            end = total
+        ranges.append((start, end))
+        start = end
+    if start < total:
+        if ranges and total - start < minimum:
+            ranges[-1] = (ranges[-1][0], total)
+        else:
+            ranges.append((start, total))
+    return ranges
+
+
+class Segmenter:
+    """Streaming utterance detector over 16-bit PCM.
+
+    Feed raw PCM as it arrives; every call returns the (start, end) sample
+    positions of the utterances that were completed by that chunk.
+    """
+
+    def __init__(self, min_length=0.0, post_silence=0.3, energy_threshold=0.01, aggressiveness=None,
+                 max_length=None):
+        """
+        Args:
+            min_length (float): Utterances shorter than this (seconds) are dropped.
+            post_silence (float): Silence (seconds) that ends an utterance.
+            energy_threshold (float): RMS level counted as speech when webrtcvad is not used.
+            aggressiveness (int, optional): Use webrtcvad with this aggressiveness instead of energy.
+            max_length (float, optional): Utterances are cut after this many seconds of continuous speech.
+        """
+        self.min_length = int(min_length * SAMPLE_RATE)
+        self.max_length = int(max_length * SAMPLE_RATE) if max_length else None
+        self.post_silence = int(post_silence * SAMPLE_RATE)
+        self.energy_threshold = energy_threshold
+        self.vad = None
+        if aggressiveness is not None:
+            import webrtcvad
+            self.vad = webrtcvad.Vad(aggressiveness)
+        self.position = 0
+        # Whole frames are read at frame-aligned positions, so they never wrap
+        self.pending = RingBuffer(FRAME_SAMPLES * BUFFER_FRAMES)
+        self.speech_start = None
+        self.last_speech = None
+
+    def is_speech(self, frame):
+        frame = np.frombuffer(frame, dtype=np.int16)
+        if self.vad is not None:
+            return self.vad.is_speech(as_bytes(frame), SAMPLE_RATE)
+        samples = frame.astype(np.float32) / 32768
+        return float(np.sqrt(np.mean(samples * samples))) > self.energy_threshold
+
+    def feed(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        utterances = []
+        # Never write more than the ring has room for next to a partial frame
+        step = self.pending.capacity - FRAME_SAMPLES
+        for offset in range(0, len(samples), step):
+            self.pending.write(samples[offset:offset + step])
+            while len(self.pending) >= FRAME_SAMPLES:
+                frame, = self.pending.read(FRAME_SAMPLES)
+                self.analyse(frame, utterances)
+        return utterances
+
+    def analyse(self, frame, utterances):
+        """Advances the utterance state by one frame, appending any utterance it completes."""
+        end = self.position + FRAME_SAMPLES
+        if self.is_speech(frame):
+            if self.speech_start is None:
+                self.speech_start = self.position
+            self.last_speech = end
+            if self.max_length and end - self.speech_start >= self.max_length:
+                utterances.append((self.speech_start, end))
+                self.speech_start = None
+        elif self.speech_start is not None and end - self.last_speech >= self.post_silence:
+            if self.last_speech - self.speech_start >= self.min_length:
+                utterances.append((self.speech_start, self.last_speech))
+            self.speech_start = None
+        self.position = end
+
+    def flush(self):
+        """Ends the stream and returns the utterance still in progress, if any."""
+        utterances = []
+        if self.speech_start is not None and self.last_speech - self.speech_start >= self.min_length:
+            utterances.append((self.speech_start, self.last_speech))
+        self.speech_start = None
+        self.pending.read()
+        return utterances
@@ -1,11 +1,20 @@
-from flask import Flask, render_template, jsonify, request
+from collections import deque
+
+from flask import Flask, Response, render_template, jsonify, request
+
+from caption.metrics import metrics
+
+# Final lines kept for /transcript
+HISTORY = 200
 
 class Web:
     def __init__(self, args):
         self.app = Flask(__name__)
-        self.transcribed_text = []
+        self.transcribed_text = deque(maxlen=HISTORY)
+        self.live = {'text': ''}
         self.PORT = 5000
         self.args = args
+        self.profiler = None  # caption.profiler.Profiler of the session, set by Speech
         self.setup_routes()
 
     def setup_routes(self):
@@ -15,15 +24,50 @@ class Web:
 
         @self.app.route('/transcript', methods=['GET'])
         def get_transcript():
-            return jsonify({'text': self.transcribed_text})
+            return jsonify({'text': list(self.transcribed_text)})
+
+        @self.app.route('/live', methods=['GET'])
+        def get_live():
+            return jsonify(self.live)
+
+        @self.app.route('/metrics', methods=['GET'])
+        def get_metrics():
+            return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+        @self.app.route('/profile', methods=['GET', 'POST'])
+        def profile():
+            # POST starts the profiler, or stops it and returns the files written
+            if self.profiler is None:
+                return jsonify({'error': 'profiling is not available'}), 404
+            files = self.profiler.toggle() if request.method == 'POST' else []
+            return jsonify({'running': self.profiler.running, 'files': files})
+
+    def handle_event(self, event):
+        """Takes a transcript event from the event bus."""
+        if event.kind == 'line':
+            self.transcribed_text.append(event.segment.text)
+            self.clear_live()
+        elif event.kind == 'partial':
+            self.set_live(event.segment)
+        elif event.kind == 'clear':
+            self.transcribed_text.clear()
+            self.clear_live()
+
+    def set_live(self, segment):
+        """Replaces the live line with the latest partial hypothesis."""
+        self.live = segment.to_dict()
+
+    def clear_live(self):
+        self.live = {'text': ''}
 
-    def start_server(self):
+    def start_server(self, background=False):
+        """Serves until the process exits; off the main thread the debug reloader cannot run."""
         print(f"Listening on http://localhost:{self.PORT}")
-        self.app.run(debug=True, host='0.0.0.0', port=self.PORT)
+        self.app.run(debug=not background, use_reloader=not background, host='0.0.0.0', port=self.PORT)
 
     def start(self):
         self.start_server()
 
 if __name__ == '__main__':
     web_app = WebApp({})
-    web_app.start()
\ No newline at end of file
+    web_app.start()
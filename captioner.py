@@ -1,14 +1,27 @@
+import time
+started = time.monotonic()
 import model
 import sys
 import os
-import caption.speech as speech
+from caption.startup import timer
 
 if __name__ == "__main__":
     try:
-        args = model.getName(sys.argv, 'base', True)
-        if args:
+        if '--profile-startup' in sys.argv:
+            timer.enable(started)
+        with timer.phase('arguments'):
+            args = model.getName(sys.argv, 'base', True)
+        if args and args['batch']:
+            import caption.batch as batch
+            batch.run(args)
+        elif args and args['streams']:
+            import caption.multistream as multistream
+            multistream.run(args)
+        elif args:
+            with timer.phase('imports'):
+                import caption.speech as speech
             args['realtime'] = False if '-nrt' in args else True
-            args['use_microphone'] = True
+            args['use_microphone'] = args['source'] is None
             caption = speech.Speech(args)
             caption.start()
     except KeyboardInterrupt:
@@ -27,6 +27,35 @@ model_names = [
     "japanese-asr/distil-whisper-large-v3-ja-reazonspeech-large",
 ]
 
+compute_types = [
+    "default", "auto",
+    "int8", "int8_float32", "int8_float16", "int8_bfloat16",
+    "int16", "float16", "bfloat16", "float32",
+]
+
+# minimum utterance length in seconds, keyed by (language, model)
+# language is 'en' for English and '' for everything else
+MIN_LENGTH_OF_RECORDING = {
+    ('en', 'tiny.en'): 1.5,
+    ('en', 'tiny'): 1.75,
+    ('en', 'base.en'): 2,
+    ('en', 'base'): 2.25,
+    ('en', 'small.en'): 2.8,
+    ('en', 'small'): 2.85,
+    ('en', 'medium.en'): 3.8,
+    ('en', 'medium'): 3.85,
+    ('en', 'large'): 4.5,
+    ('en', 'large-v2'): 5,
+    ('en', 'large-v3'): 8,
+    ('', 'tiny'): 2,
+    ('', 'base'): 3,
+    ('', 'small'): 4,
+    ('', 'medium'): 5,
+    ('', 'large'): 7,
+    ('', 'large-v2'): 9,
+    ('', 'large-v3'): 12,
+}
+
 # ---------- helpers ----------
 
 def is_numeric(s):
@@ -48,6 +77,10 @@ def resolve_model(token, default):
         return default
     return token
 
+def min_length_of_recording(model_name, lang):
+    key = 'en' if lang is not None and 'en' in lang else ''
+    return MIN_LENGTH_OF_RECORDING.get((key, model_name), 1)
+
 # ---------- main parser ----------
 
 def getName(argv, default, captioner=False):
@@ -63,14 +96,40 @@ def getName(argv, default, captioner=False):
         "web": False,
         "debug_mode": False,
         "test_mode": False,
+        "batch": False,
+        "files": [],
+        "workers": None,
+        "output": None,
+        "split": False,
+        "chunk_length": None,
+        "backend": "realtimestt",
+        "source": None,
+        "model_cache_mb": None,
+        "calibrate": None,
+        "history": None,
+        "max_lines": None,
+        "compute_type": "default",
+        "calibration_clip": None,
+        "cpu_split": None,
+        "pin_cpus": False,
+        "partial_rate": 10.0,
+        "streams": [],
+        "max_batch": None,
+        "max_wait": None,
+        "gate": True,
+        "gate_vad": None,
+        "profile_startup": False,
+        "profile": False,
         "path": os.getcwd(),
     }
 
     args = argv[1:]
+    batch = "-b" in args or "--batch" in args
 
     # handle simple flags (no verbosity explosion)
     cleaned = []
-    for a in args:
+    it = iter(args)
+    for a in it:
         if a in ("-g", "--gui"):
             result["gui"] = True
         elif a in ("-w", "--web"):
@@ -79,6 +138,95 @@ def getName(argv, default, captioner=False):
             result["debug_mode"] = True
         elif a == "--test":
             result["test_mode"] = True
+        elif a in ("-b", "--batch"):
+            result["batch"] = True
+        elif a in ("-j", "--workers"):
+            value = next(it, "")
+            result["workers"] = int(value) if is_numeric(value) else None
+            if result["workers"] is not None and result["workers"] < 1:
+                print(f"Warning: {a} needs at least 1 worker, using one per CPU")
+                result["workers"] = None
+        elif a == "--backend":
+            result["backend"] = next(it, "realtimestt")
+        elif a == "--source":
+            # audio file to replay, or '-' for raw 16 kHz 16-bit PCM on stdin
+            result["source"] = next(it, None)
+        elif a == "--model-cache":
+            # memory budget in MB for models kept loaded after a switch
+            value = next(it, "")
+            result["model_cache_mb"] = int(value) if is_numeric(value) else None
+        elif a == "--history":
+            # transcript lines kept in memory; older ones are read back from disk
+            value = next(it, "")
+            result["history"] = int(value) if is_numeric(value) else None
+        elif a == "--max-lines":
+            # caption lines kept in the window
+            value = next(it, "")
+            result["max_lines"] = int(value) if is_numeric(value) else None
+        elif a == "--calibrate":
+            result["calibrate"] = True
+        elif a == "--no-calibrate":
+            result["calibrate"] = False
+        elif a in ("-c", "--compute-type"):
+            result["compute_type"] = next(it, "default")
+        elif a == "--calibration-clip":
+            # recording used to check accuracy when picking a compute type
+            result["calibration_clip"] = next(it, None)
+        elif a == "--cpu-split":
+            # MAIN:REALTIME thread counts, e.g. 6:2
+            value = next(it, "")
+            parts = value.split(":")
+            if len(parts) == 2 and all(is_numeric(part) for part in parts) \
+                    and int(parts[0]) >= 1 and int(parts[1]) >= 0:
+                result["cpu_split"] = value
+            else:
+                print(f"Warning: {a} takes MAIN:REALTIME thread counts such as 6:2, using the default split")
+        elif a == "--pin-cpus":
+            result["pin_cpus"] = True
+        elif a == "--partial-rate":
+            # live line updates per second, 0 to show every partial hypothesis
+            try:
+                result["partial_rate"] = float(next(it, ""))
+            except ValueError:
+                result["partial_rate"] = 10.0
+        elif a == "--stream":
+            # ID=SOURCE, repeatable; SOURCE is a file, '-', 'mic' or mic:N
+            result["streams"].append(next(it, ""))
+        elif a == "--max-batch":
+            # most utterances decoded together in one model call
+            value = next(it, "")
+            result["max_batch"] = int(value) if is_numeric(value) else None
+        elif a == "--max-wait":
+            # seconds an utterance may wait for others to batch with
+            try:
+                result["max_wait"] = float(next(it, ""))
+            except ValueError:
+                result["max_wait"] = None
+        elif a == "--no-gate":
+            # send every segment to the model, even silence and noise
+            result["gate"] = False
+        elif a == "--gate-vad":
+            # also require webrtcvad speech frames, aggressiveness 0-3
+            value = next(it, "")
+            result["gate_vad"] = int(value) if is_numeric(value) else None
+        elif a == "--profile-startup":
+            # write per-phase wall time and peak RSS next to the session log
+            result["profile_startup"] = True
+        elif a == "--profile":
+            # sample stacks and trace allocations from the start; Ctrl+Alt+P or POST /profile toggles it later
+            result["profile"] = True
+        elif a == "--split":
+            result["split"] = True
+        elif a == "--chunk-length":
+            try:
+                result["chunk_length"] = float(next(it, ""))
+            except ValueError:
+                result["chunk_length"] = None
+        elif a in ("-o", "--output"):
+            result["output"] = next(it, None)
+        elif batch and os.path.exists(a):
+            # in batch mode existing files/directories are inputs, not models
+            result["files"].append(a)
         else:
             cleaned.append(a)
 
@@ -108,6 +256,9 @@ def getName(argv, default, captioner=False):
                 f"Model '{result['model_name']}' is English-only but lang={result['lang']}"
             )
 
+    if result["compute_type"] not in compute_types:
+        print(f"Warning: {result['compute_type']} is not a recognized compute type")
+
     if result["model_name"] not in model_names:
         print(f"Warning: {result['model_name']} is not a recognized model name")
 
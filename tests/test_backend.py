@@ -0,0 +1,164 @@
+import contextlib
+import sys
+import threading
+import time
+import types
+import wave
+
+import pytest
+
+import model
+import caption.backend as backend
+import caption.speech as speech
+from caption.registry import registry
+
+
+class FakeRecorder:
+    """Stands in for AudioToTextRecorder: counts the audio fed to it and never recognizes anything."""
+
+    instances = []
+
+    def __init__(self, use_microphone=False, **kwargs):
+        self.model = kwargs['model']
+        self.chunks = 0
+        self.interrupt_stop_event = threading.Event()
+        self.audio_queue = None
+        self.buffer_size = 512
+        FakeRecorder.instances.append(self)
+
+    def feed_audio(self, chunk):
+        self.chunks += 1
+
+    def clear_audio_queue(self):
+        pass
+
+    def set_microphone(self, on):
+        pass
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def captioner(tmp_path, monkeypatch):
+    path = str(tmp_path / 'speech.wav')
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(backend.SAMPLE_RATE)
+        wav.writeframes(bytes(backend.SAMPLE_RATE * 2 * 2))
+    monkeypatch.setitem(sys.modules, 'RealtimeSTT', types.SimpleNamespace(AudioToTextRecorder=FakeRecorder))
+    monkeypatch.setattr(backend.cpu, 'model_threads', lambda plan: contextlib.nullcontext())
+    monkeypatch.setattr(model, 'first', True)
+    FakeRecorder.instances = []
+    args = model.getName(['captioner.py', '--source', path, '--no-calibrate', '--no-gate'], 'tiny')
+    args['realtime'] = False
+    captioner = speech.Speech(args)
+    captioner.post_speech_silence_duration = 0.0
+    yield captioner
+    captioner.stop = True
+    if captioner.recorder is not None:
+        captioner.recorder.stop()
+    registry.clear()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_file_source_follows_every_switch(captioner):
+    first = backend.create_recognizer(captioner)
+    captioner.recorder = first
+    for name in ('base', 'small'):
+        previous = captioner.recorder
+        time.sleep(0.2)
+        captioner.switch(name, None, 1.0)
+        assert wait_for(lambda: captioner.recorder is not previous)
+    last = captioner.recorder
+    assert last.recorder.model == 'small'
+    fed = last.recorder.chunks
+    # The file and the trailing silence reach the last recognizer, which is then finished
+    assert wait_for(lambda: last.finished, timeout=10.0)
+    assert last.recorder.chunks > fed
+    assert last.recorder.interrupt_stop_event.is_set()
+    assert [recorder.model for recorder in FakeRecorder.instances] == ['tiny', 'base', 'small']
+    assert all(recorder.chunks for recorder in FakeRecorder.instances)
+
+
+def test_superseded_switch_is_not_handed_over(captioner, monkeypatch):
+    first = backend.create_recognizer(captioner)
+    captioner.recorder = first
+    create = backend.create_recognizer
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def slow_create(owner, source=None, listen=True):
+        started.set()
+        proceed.wait(5.0)
+        return create(owner, source, listen)
+
+    monkeypatch.setattr(backend, 'create_recognizer', slow_create)
+    captioner.switch('base', None, 1.0)
+    assert started.wait(5.0)
+    # The second change arrives while the first recognizer is still loading
+    captioner.switch('small', None, 1.0)
+    proceed.set()
+    assert wait_for(lambda: captioner.recorder is not first)
+    assert captioner.recorder.recorder.model == 'small'
+    # The first build read the newest settings too, was dropped as superseded and its
+    # recorder went back to the registry, where the second build picked it up
+    assert [recorder.model for recorder in FakeRecorder.instances] == ['tiny', 'small']
+    assert registry.entries[id(captioner.recorder.recorder)].in_use
+    assert not captioner.handover_pending
+
+
+def test_switch_back_to_the_loaded_model_drops_the_pending_build(captioner, monkeypatch):
+    first = backend.create_recognizer(captioner)
+    captioner.recorder = first
+    create = backend.create_recognizer
+    started = threading.Event()
+    proceed = threading.Event()
+    built = []
+
+    def slow_create(owner, source=None, listen=True):
+        started.set()
+        proceed.wait(5.0)
+        built.append(create(owner, source, listen))
+        return built[-1]
+
+    monkeypatch.setattr(backend, 'create_recognizer', slow_create)
+    captioner.switch('base', None, 1.0)
+    assert started.wait(5.0)
+    assert captioner.handover_pending and first.handover_chunks is not None
+    captioner.switch('tiny', None, 1.0)
+    assert not captioner.handover_pending and first.handover_chunks is None
+    generation = captioner.switch_generation
+    proceed.set()
+    # The build started for 'base' is superseded; its recorder is built and goes back to the registry
+    assert wait_for(lambda: built and built[0].finished)
+    assert captioner.recorder is first
+    assert captioner.switch_generation == generation
+    assert not registry.entries[id(built[0].recorder)].in_use
+    assert registry.entries[id(first.recorder)].in_use
+
+
+def test_failed_build_keeps_the_old_recognizer(captioner, monkeypatch):
+    first = backend.create_recognizer(captioner)
+    captioner.recorder = first
+    failed = threading.Event()
+
+    def broken_create(owner, source=None, listen=True):
+        failed.set()
+        raise RuntimeError('no such model')
+
+    monkeypatch.setattr(backend, 'create_recognizer', broken_create)
+    captioner.switch('base', None, 1.0)
+    assert failed.wait(5.0)
+    assert wait_for(lambda: not captioner.handover_pending)
+    assert captioner.recorder is first
+    assert first.handover_chunks is None
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+import caption.bus as bus
+
+
+@pytest.fixture
+def blocked():
+    """A handler that holds the subscription thread on the first event until released."""
+    entered = threading.Event()
+    release = threading.Event()
+    received = []
+
+    def handler(event):
+        entered.set()
+        release.wait(5.0)
+        received.append(event.segment)
+
+    yield handler, entered, release, received
+    release.set()
+
+
+def fill(events, subscription, entered, count=4):
+    events.publish('line', 1)
+    assert entered.wait(5.0)
+    # The first event is in the handler; the rest meet a queue of two
+    for number in range(2, count + 1):
+        events.publish('line', number)
+
+
+@pytest.mark.parametrize('policy, expected', [(bus.DROP, [1, 2, 3]), (bus.DROP_OLDEST, [1, 3, 4]),
+                                              (bus.BLOCK, [1, 2, 3])])
+def test_full_queue_follows_policy(blocked, policy, expected):
+    handler, entered, release, received = blocked
+    events = bus.EventBus()
+    subscription = events.subscribe('slow', handler, maxsize=2, policy=policy, timeout=0.05)
+    fill(events, subscription, entered)
+    assert subscription.stats() == {'queued': 2, 'delivered': 0, 'dropped': 1, 'policy': policy}
+    release.set()
+    events.close()
+    assert received == expected
+    assert events.stats()['slow']['delivered'] == 3
+
+
+def test_block_waits_for_room(blocked):
+    handler, entered, release, received = blocked
+    events = bus.EventBus()
+    subscription = events.subscribe('slow', handler, maxsize=2, policy=bus.BLOCK, timeout=5.0)
+    fill(events, subscription, entered, count=3)
+    threading.Timer(0.05, release.set).start()
+    events.publish('line', 4)
+    events.close()
+    assert received == [1, 2, 3, 4]
+    assert subscription.stats()['dropped'] == 0
+
+
+def test_subscribers_only_get_their_kinds():
+    events = bus.EventBus()
+    lines, everything = [], []
+    events.subscribe('lines', lambda event: lines.append(event.kind), kinds=['line'])
+    events.subscribe('all', lambda event: everything.append(event.kind))
+    for kind in ('partial', 'line', 'clear'):
+        events.publish(kind)
+    events.close()
+    assert lines == ['line']
+    assert everything == ['partial', 'line', 'clear']
+
+
+def test_unknown_policy_is_refused():
+    with pytest.raises(ValueError):
+        bus.Subscription('bad', print, policy='ignore')
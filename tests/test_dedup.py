@@ -0,0 +1,84 @@
+import pytest
+
+import caption.dedup as dedup
+
+# Captions as they come out of the recognizer: repeats, near repeats with
+# different punctuation or case, short filler and unrelated lines
+CORPUS = [
+    "Good morning everyone, and welcome to the meeting.",
+    "Good morning everyone and welcome to the meeting",
+    "Today we are going to talk about the budget.",
+    "Thank you.",
+    "Thank you.",
+    "Today we're going to talk about the budget for next year.",
+    "I",
+    "a",
+    "Let's start with the numbers from the last quarter.",
+    "The numbers from the last quarter look good.",
+    "Let's start with the numbers from the last quarter!",
+    "Sales went up by ten percent.",
+    "Sales went up by ten percent in Europe.",
+    "Sales went up by twelve percent in Asia.",
+    "Any questions so far?",
+    "Any questions so far",
+    "No questions.",
+    "Okay, then let's move on.",
+    "Okay then let's move on to the next item.",
+    "The next item is hiring.",
+    "We want to hire three engineers this year.",
+    "We want to hire three engineers.",
+    "Three engineers this year.",
+    "Thank you.",
+    "Good morning everyone, and welcome to the meeting.",
+    "See you next week.",
+    "See you next week!",
+    "Bye.",
+]
+
+
+def sklearn_similarities(new_text, shown):
+    """Cosine similarity of new_text to each recent shown line, as the old GUI check computed it."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    lines = [line[:dedup.MAX_CHARS] for line in shown[-dedup.RECENT_COUNT:]]
+    try:
+        vectors = TfidfVectorizer().fit_transform([new_text[:dedup.MAX_CHARS]] + lines).toarray()
+    except ValueError:
+        return [0.0]
+    return cosine_similarity(vectors)[0][1:]
+
+
+def test_detector_matches_sklearn_check():
+    pytest.importorskip('sklearn')
+    detector = dedup.DuplicateDetector()
+    shown = []
+    for line in CORPUS:
+        expected = dedup.sklearn_is_similar(dedup.normalize(line), [dedup.normalize(text) for text in shown])
+        similarity = detector.similarity(line)
+        reference = max(sklearn_similarities(dedup.normalize(line), [dedup.normalize(text) for text in shown]),
+                        default=0.0)
+        assert similarity == pytest.approx(reference, abs=1e-9), line
+        if abs(similarity - dedup.THRESHOLD) > 1e-9:
+            # Exactly at the threshold the float rounding of either side decides
+            assert detector.is_duplicate(line) == expected, line
+        if not expected:
+            shown.append(line)
+            detector.add(line)
+
+
+def test_recent_lines_fall_out():
+    detector = dedup.DuplicateDetector(recent_count=2)
+    detector.add("the first line of captions")
+    detector.add("something else")
+    assert detector.is_duplicate("the first line of captions")
+    detector.add("and a third one")
+    assert not detector.is_duplicate("the first line of captions")
+    assert len(detector) == 2
+
+
+def test_unspaced_scripts_compare_character_bigrams():
+    detector = dedup.DuplicateDetector()
+    detector.add("今日は良い天気ですね明日も晴れるでしょう")
+    # One particle differs; TfidfVectorizer would see two unrelated one-word lines
+    assert detector.is_duplicate("今日も良い天気ですね明日も晴れるでしょう")
+    assert not detector.is_duplicate("明日の会議は十時からです")
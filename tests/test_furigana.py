@@ -0,0 +1,42 @@
+import threading
+from types import SimpleNamespace
+
+import caption.furigana as furigana
+
+READINGS = {'今日': 'キョウ', '天気': 'テンキ', '明日': 'アシタ'}
+
+
+class FakeTagger:
+    """Splits on spaces and reads words from READINGS; records every line it tags."""
+
+    def __init__(self):
+        self.lines = []
+
+    def __call__(self, text):
+        self.lines.append(text)
+        return [SimpleNamespace(surface=word, white_space='', feature=SimpleNamespace(kana=READINGS.get(word)))
+                for word in text.split()]
+
+
+def test_queued_lines_are_tagged_in_one_pass_and_delivered_in_order():
+    received = []
+    annotator = furigana.Furigana(lambda line, generation: received.append((line, generation)))
+    annotator.available = True
+    annotator.tagger = FakeTagger()
+    passes = []
+    annotate_lines = annotator.annotate_lines
+    annotator.annotate_lines = lambda texts: passes.append(len(texts)) or annotate_lines(texts)
+    # Lines pile up in the queue before the worker gets to them, as a page of scrollback does
+    annotator.thread = threading.current_thread()
+    annotator.submit('今日 は')
+    annotator.submit('hello')
+    annotator.discard()
+    annotator.submit('天気 です')
+    annotator.submit('明日 も 天気')
+    annotator.close()
+    annotator.run()
+
+    assert received == [('今日(きょう)は', 0), ('hello', 0), ('天気(てんき)です', 1), ('明日(あした)も天気(てんき)', 1)]
+    assert passes == [4]
+    assert annotator.tagger.lines == ['今日 は', '天気 です', '明日 も 天気']
+    assert annotator.stats() == {'cached': 3, 'hits': 1, 'misses': 3}
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+import caption.gui as gui
+
+
+@pytest.fixture
+def window():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    window = gui.CaptionerGUI()
+    window.speech = None
+    window.set_line_limit(3)
+    yield window
+    window.deleteLater()
+    app.processEvents()
+
+
+def shown(window):
+    return window.caption_view.toPlainText().split('\n')
+
+
+def test_view_keeps_the_line_limit_with_and_without_live_line(window):
+    for i in range(5):
+        window.show_line(f'line {i}')
+    assert shown(window) == ['line 2', 'line 3', 'line 4']
+    window.updateLiveLine('live')
+    # The live line takes a block of its own beyond the final lines
+    assert shown(window) == ['line 2', 'line 3', 'line 4', 'live']
+    window.live_line = ''
+    window.show_line('line 5')
+    assert shown(window) == ['line 3', 'line 4', 'line 5']
+    window.set_line_limit(2)
+    assert shown(window) == ['line 4', 'line 5']
@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+from caption.log import Log
+
+ARGS = {'lang': 'en', 'model_name': 'tiny'}
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = Log(ARGS, path=str(tmp_path), filename='session', test='')
+    yield log
+    log.close_log_file()
+
+
+def test_read_lines_pages_any_range(log):
+    for number in range(10):
+        log.write_log(f'line {number}')
+    log.write_log('not a caption', indexed=False)
+    log.write_log('line 10')
+    assert log.line_count() == 11
+    assert log.read_lines(3, 6) == ['line 3', 'line 4', 'line 5']
+    # Entries that are not indexed are skipped even inside one read
+    assert log.read_lines(9, 20) == ['line 9', 'line 10']
+    assert log.read_lines(11, 12) == []
+
+
+def test_read_lines_across_files(log):
+    log.write_log('first file 0')
+    log.write_log('first file 1')
+    # The date changes: the next entry opens a new log file
+    log.set_filename('next-day')
+    log.current_date = date(2000, 1, 1)
+    log.write_log('second file 0')
+    log.write_log('second file 1')
+    assert len(log.paths) == 2
+    assert list(log.entry_files) == [0, 0, 1, 1]
+    assert log.read_lines(0, 4) == ['first file 0', 'first file 1', 'second file 0', 'second file 1']
+    assert log.read_lines(1, 3) == ['first file 1', 'second file 0']
+
+
+def test_non_ascii_lines_come_back_intact(log):
+    log.write_log('今日は良い天気ですね')
+    log.write_log('naïve café')
+    assert log.read_lines(0, 2) == ['今日は良い天気ですね', 'naïve café']
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from caption.partial import Coalescer
+
+
+def test_latest_value_arrives_and_intermediate_ones_are_dropped():
+    received = []
+    arrived = threading.Event()
+
+    def callback(value):
+        received.append(value)
+        if value == 'c':
+            arrived.set()
+
+    coalescer = Coalescer(callback, rate=20)
+    coalescer.update('a')
+    coalescer.update('b')
+    coalescer.update('c')
+    # The first update is delivered at once, the newest when the interval is up
+    assert received == ['a']
+    assert arrived.wait(5.0)
+    assert received == ['a', 'c']
+    assert coalescer.stats() == {'delivered': 2, 'dropped': 1}
+
+
+def test_reset_drops_the_waiting_value():
+    received = []
+    coalescer = Coalescer(received.append, rate=20)
+    coalescer.update('a')
+    coalescer.update('b')
+    coalescer.reset()
+    time.sleep(0.15)
+    assert received == ['a']
+    # A new value after the interval is delivered at once
+    coalescer.update('c')
+    assert received == ['a', 'c']
+
+
+def test_rate_zero_delivers_every_update():
+    received = []
+    coalescer = Coalescer(received.append, rate=0)
+    for value in range(5):
+        coalescer.update(value)
+    assert received == [0, 1, 2, 3, 4]
+    assert coalescer.stats() == {'delivered': 5, 'dropped': 0}
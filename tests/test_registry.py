@@ -0,0 +1,67 @@
+from caption.registry import ModelRegistry, estimate_size_mb
+
+
+class Model:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+
+def loader(name, loaded):
+    def load():
+        loaded.append(name)
+        return Model(name)
+    return load
+
+
+def close(model):
+    model.closed = True
+
+
+def test_released_models_are_reused():
+    registry = ModelRegistry(budget_mb=1000)
+    loaded = []
+    first, reused = registry.acquire('tiny', loader('tiny', loaded), 100, close)
+    assert not reused
+    # In use, so a second caller gets its own copy
+    second, reused = registry.acquire('tiny', loader('tiny', loaded), 100, close)
+    assert not reused and second is not first
+    registry.release(first)
+    again, reused = registry.acquire('tiny', loader('tiny', loaded), 100, close)
+    assert reused and again is first
+    assert loaded == ['tiny', 'tiny']
+
+
+def test_least_recently_used_idle_model_is_evicted():
+    registry = ModelRegistry(budget_mb=250)
+    loaded = []
+    tiny, _ = registry.acquire('tiny', loader('tiny', loaded), 100, close)
+    base, _ = registry.acquire('base', loader('base', loaded), 100, close)
+    registry.release(tiny)
+    registry.release(base)
+    # Reusing tiny makes base the least recently used
+    registry.acquire('tiny', loader('tiny', loaded), 100, close)
+    registry.release(tiny)
+    small, _ = registry.acquire('small', loader('small', loaded), 100, close)
+    assert base.closed and not tiny.closed
+    assert [entry.key for entry in registry.entries.values()] == ['tiny', 'small']
+    assert registry.size_mb() == 200
+
+
+def test_models_in_use_are_never_evicted():
+    registry = ModelRegistry(budget_mb=150)
+    loaded = []
+    tiny, _ = registry.acquire('tiny', loader('tiny', loaded), 100, close)
+    base, _ = registry.acquire('base', loader('base', loaded), 100, close)
+    # Over budget, but both are in use
+    assert not tiny.closed and not base.closed
+    registry.release(base)
+    assert base.closed and not tiny.closed
+    registry.clear()
+    assert tiny.closed and not registry.entries
+
+
+def test_estimate_size_mb():
+    assert estimate_size_mb('large-v3') == 4700
+    assert estimate_size_mb('Systran/faster-whisper-small', 'int8') == 1000 / 3
+    assert estimate_size_mb('distil-large-v3', 'float16') == 4700 * 0.6 / 2
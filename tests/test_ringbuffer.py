@@ -0,0 +1,72 @@
+import io
+
+import numpy as np
+import pytest
+
+from caption.ringbuffer import RingBuffer
+
+
+def samples(start, count):
+    return np.arange(start, start + count, dtype=np.int16)
+
+
+def test_views_wrap_around_the_end():
+    ring = RingBuffer(8)
+    ring.write(samples(0, 6))
+    ring.read()
+    ring.write(samples(6, 5))
+    views = ring.views(6, 11)
+    assert [len(view) for view in views] == [2, 3]
+    assert ring.window(6, 11).tolist() == list(range(6, 11))
+    # A window that does not wrap is a view into the ring, not a copy
+    assert np.shares_memory(ring.window(8, 11), ring.data)
+
+
+def test_valid_detects_a_lapped_position():
+    ring = RingBuffer(8)
+    ring.write(samples(0, 4))
+    view = ring.window(0, 4)
+    assert ring.valid(0)
+    ring.write(samples(4, 4))
+    # Exactly one lap: the view still holds 0-3 until the next write
+    assert ring.valid(0) and view.tolist() == [0, 1, 2, 3]
+    ring.write(samples(8, 1))
+    assert not ring.valid(0)
+    assert ring.valid(1)
+    assert view.tolist() == [8, 1, 2, 3]
+    with pytest.raises(IndexError):
+        ring.views(0, 4)
+
+
+def test_overrun_skips_to_the_oldest_sample():
+    ring = RingBuffer(8)
+    ring.write(samples(0, 6))
+    ring.write(samples(6, 6))
+    assert ring.overruns == 1
+    assert len(ring) == 8
+    assert np.concatenate(ring.read()).tolist() == list(range(4, 12))
+    assert len(ring) == 0
+
+
+def test_write_larger_than_capacity_keeps_the_newest():
+    ring = RingBuffer(4)
+    ring.write(samples(0, 10))
+    assert ring.written == 10
+    assert ring.oldest() == 6
+    assert ring.window(6, 10).tolist() == [6, 7, 8, 9]
+
+
+def test_write_from_reads_into_the_ring():
+    ring = RingBuffer(6)
+    source = io.BytesIO(samples(0, 10).tobytes())
+    counts = []
+    while True:
+        count = ring.write_from(source.readinto, 4)
+        if not count:
+            break
+        counts.append(count)
+        ring.read()
+    # Reads stop where the ring wraps
+    assert counts == [4, 2, 4]
+    assert ring.written == 10
+    assert ring.window(4, 10).tolist() == list(range(4, 10))
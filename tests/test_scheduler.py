@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+import caption.scheduler as scheduler
+
+SAMPLE_RATE = scheduler.SAMPLE_RATE
+
+
+def utterance(seconds, frequency):
+    """A tone with a little noise, standing in for speech of the given length."""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    rng = np.random.default_rng(int(frequency))
+    return (0.3 * np.sin(2 * np.pi * frequency * t) + 0.01 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+@pytest.fixture(scope='module')
+def model():
+    faster_whisper = pytest.importorskip('faster_whisper')
+    try:
+        return faster_whisper.WhisperModel('tiny', device='cpu', compute_type='int8')
+    except Exception as e:
+        pytest.skip(f"tiny model not available: {e}")
+
+
+def test_batch_decodes_each_utterance_as_its_own_clip(model, monkeypatch):
+    from faster_whisper import BatchedInferencePipeline
+    calls = []
+    transcribe = BatchedInferencePipeline.transcribe
+
+    def recording_transcribe(self, audio, **kwargs):
+        segments, info = transcribe(self, audio, **kwargs)
+        segments = list(segments)
+        calls.append((kwargs['clip_timestamps'], segments, info))
+        return segments, info
+
+    monkeypatch.setattr(BatchedInferencePipeline, 'transcribe', recording_transcribe)
+    utterances = [utterance(1.5, 220), utterance(2.5, 440)]
+    results = scheduler.batched_transcriber(model, lang='en')(utterances)
+
+    assert len(results) == 2
+    assert all(lang == 'en' for _, lang in results)
+    (clips, segments, info), = calls
+    assert clips == [{'start': 0.0, 'end': 1.5}, {'start': 1.5, 'end': 4.0}]
+    # Only the two clips were decoded, not an empty or misplaced slice of the audio
+    assert info.duration_after_vad == pytest.approx(4.0)
+    for segment in segments:
+        assert 0.0 <= segment.start <= segment.end <= 4.0 + 0.05